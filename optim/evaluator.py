@@ -0,0 +1,194 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.cache import MarsCache, file_digest, solver_salt, pack_result, unpack_result
+from utils.batch import evaluate_candidates
+from utils.catalog import TBAR_TYPE, load_tbar_catalog, action_options, group_count, valid_group_mask, nearest_option
+from utils.mars import parse_output_arrays, RuleEngine, DEFAULT_EXCLUDED_STIFFENERS
+from utils.parser import Ma2Index, Ma2Template, SPEC_POSITIONS
+from utils.design import DesignLayout
+from utils.processing import group_stiff
+from utils.solver import get_solver, SolverError
+from utils.weight import WeightTracker, stiffener_spans, STEEL_DENSITY
+from utils.workspace import make_worker_config
+
+
+class DesignEvaluator:
+    # design: {group: (hweb, tweb, hflan, tflan)} - 기준 설계에서 바꿀 그룹만 담는다.
+    # 기준 설계는 source_path 의 STIFF SCANT (기본값은 temp.ma2) 이고, 다른 섹션은 temp.ma2 를 쓴다.
+    # 작업자마다 별도의 작업 폴더(w{prefix}{k})와 solver 를 두고, 스레드 풀에서 설계를 나눠 평가한다.
+    # batch_size 가 1 보다 크면 작업자마다 설계를 batch_size 개씩 묶어 MARS 한 번(evaluate_candidates)으로 평가한다.
+    def __init__(self, config, n_workers=4, prefix="opt", batch_size=1, source_path=None):
+        self.config = config
+        self.batch_size = max(1, int(batch_size or 1))
+        with Ma2Index(source_path or config["temp_path"]) as index:
+            df_scant = index["stiff scant"]
+            df_stiff_loc = index["stiff loc"]
+            table = index.table("stiff scant")
+
+        self.df_stiff = group_stiff(df_scant, df_stiff_loc)
+        spec_cols = self.df_stiff.columns[4:8]
+        self.df_stiff[spec_cols] = self.df_stiff[spec_cols].astype(np.float64)
+        self.baseline_specs = self.df_stiff[spec_cols].to_numpy(dtype=np.float64)
+
+        groups = self.df_stiff["group"].to_numpy()
+        self.n_groups = group_count(df_stiff_loc)
+        self.valid_groups = np.flatnonzero(valid_group_mask(self.df_stiff, self.n_groups, TBAR_TYPE))
+        self.layout = DesignLayout(groups, self.baseline_specs, self.n_groups)
+        self.options = action_options(config, load_tbar_catalog(config))
+
+        self.weights = WeightTracker(
+            self.baseline_specs,
+            stiffener_spans(self.df_stiff, config.get("stiffener_span", 1.0)),
+            groups,
+            self.df_stiff["Ipan"].to_numpy(),
+            density=config.get("steel_density", STEEL_DENSITY),
+        )
+        self.rules = RuleEngine(config.get("excluded_stiffeners", DEFAULT_EXCLUDED_STIFFENERS))
+
+        self.salt = solver_salt(config, file_digest(config["temp_path"]))
+        self.cache = None
+        if config.get("cache_dir"):
+            self.cache = MarsCache(config["cache_dir"], config.get("cache_max_entries", 5000))
+
+        self.workers = queue.Queue()
+        for k in range(n_workers):
+            worker = make_worker_config(config, f"{prefix}{k}")
+            template = Ma2Template(worker["temp_path"], table, len(self.df_stiff))
+            self.workers.put((worker, template, get_solver(worker)))
+        self.pool = ThreadPoolExecutor(n_workers)
+
+        self.lock = threading.Lock()
+        self.solver_calls = 0
+        self.solver_failures = 0
+
+    def genome(self, specs=None):
+        # 행별 치수 -> (T-bar 그룹 수, 4) 치수 선택지(self.options) 인덱스. 그룹의 첫 행 치수에 가장 가까운 값을 쓴다.
+        specs = self.baseline_specs if specs is None else specs
+        genome = np.empty((len(self.valid_groups), len(self.options)), dtype=np.int64)
+        for i, group in enumerate(self.valid_groups):
+            row = specs[self.layout.rows(group)[0]]
+            genome[i] = [nearest_option(options, value) for options, value in zip(self.options, row)]
+        return genome
+
+    def design(self, genome, initial=None):
+        # initial 을 주면 initial 과 유전자가 다른 그룹만 담아, 나머지 그룹은 기준 설계의 행 치수를 그대로 둔다.
+        return {
+            int(group): tuple(options[idx] for options, idx in zip(self.options, genome[i]))
+            for i, group in enumerate(self.valid_groups)
+            if initial is None or (genome[i] != initial[i]).any()
+        }
+
+    def state(self, design):
+        state = self.layout.state()
+        for group, spec in design.items():
+            state.set(group, spec)
+        return state
+
+    def specs(self, design):
+        return self.state(design).specs()
+
+    def weight(self, design):
+        return self.weights.weight_of(self.specs(design))
+
+    def _result(self, design):
+        worker, template, solver = self.workers.get()
+        try:
+            template.reset()
+            for group, spec in design.items():
+                template.set_values(self.layout.rows(group), SPEC_POSITIONS, spec)
+
+            key = template.key(self.salt)
+            if self.cache is not None:
+                arrays = self.cache.get(key)
+                if arrays is not None:
+                    result = unpack_result(arrays, ("stiffener",))
+                    if result is not None:
+                        return result
+
+            template.write(worker["input_path"])
+            with self.lock:
+                self.solver_calls += 1
+            try:
+                solver.run(worker)
+            except SolverError:
+                with self.lock:
+                    self.solver_failures += 1
+                return None
+            result = parse_output_arrays(worker["output_path"], ("stiffener",))
+        finally:
+            self.workers.put((worker, template, solver))
+
+        if self.cache is not None:
+            self.cache.put(key, pack_result(result))
+        return result
+
+    def _batch_results(self, designs):
+        worker, template, solver = self.workers.get()
+        try:
+            spec_cols = self.df_stiff.columns[4:8]
+            tables = [
+                self.state(design).frame(self.df_stiff, spec_cols).drop(columns=["group", "stiff_index"])
+                for design in designs
+            ]
+            runs = solver.metrics["runs"]
+            results = evaluate_candidates(worker, tables, cache=self.cache, solver=solver, salt=self.salt)
+            runs = solver.metrics["runs"] - runs
+        finally:
+            self.workers.put((worker, template, solver))
+
+        results = [result if result is not False else None for result in results]
+        with self.lock:
+            self.solver_calls += runs
+            self.solver_failures += sum(result is None for result in results)
+        return results
+
+    def evaluate(self, design):
+        return self._score(design, self._result(design))
+
+    def _score(self, design, result):
+        weight = self.weight(design)
+        if result is None:
+            return {"ok": False, "weight": weight, "violation": np.inf, "n_fail": -1, "margin": None}
+
+        evaluation = self.rules.evaluate(result, mode="stiff")
+        panels, stiffeners, margins = self.rules.min_margin(evaluation, mode="stiff")
+        # 항목마다 단위가 달라서 규칙값 대비 부족한 비율을 위반량으로 쓴다.
+        margin = evaluation["margin"]
+        with np.errstate(invalid="ignore"):
+            failed = margin < 0
+        scale = np.maximum(np.abs(np.nan_to_num(evaluation["rule"][failed])), 1e-9)
+        violation = float(np.sum(-margin[failed] / scale))
+        return {
+            "ok": True,
+            "weight": weight,
+            "violation": violation,
+            "n_fail": int((~evaluation["pass"]).sum()),
+            "margin": margins,
+            "panel": panels,
+            "stiffener": stiffeners,
+        }
+
+    def evaluate_many(self, designs):
+        if self.batch_size <= 1:
+            return list(self.pool.map(self.evaluate, designs))
+
+        batches = [designs[i:i + self.batch_size] for i in range(0, len(designs), self.batch_size)]
+        scores = []
+        for batch, results in zip(batches, self.pool.map(self._batch_results, batches)):
+            scores.extend(self._score(design, result) for design, result in zip(batch, results))
+        return scores
+
+    def write_design(self, design, source_path, output_path):
+        # source_path 의 .ma2 에서 design 의 그룹 행만 바꿔 저장한다. (_result 와 같은 Ma2Template 경로)
+        with Ma2Index(source_path) as index:
+            template = Ma2Template(source_path, index.table("stiff scant"), len(self.df_stiff))
+        for group, spec in design.items():
+            template.set_values(self.layout.rows(group), SPEC_POSITIONS, spec)
+        template.write(output_path)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
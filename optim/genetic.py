@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+from optim.evaluator import DesignEvaluator
+from utils.catalog import TBAR_OPTIONS
+from utils.fileio import save_npz
+
+
+def rank_order(violations, weights):
+    # 제약 위반이 적은 순, 위반이 같으면(모두 0 이면) 가벼운 순. 만족해는 항상 위반해보다 앞선다.
+    return np.lexsort((weights, violations))
+
+
+class GeneticOptimizer:
+    # 유전자: (T-bar 그룹 수, 4) 정수 배열. 각 값은 evaluator.options 의 hweb/tweb/hflan/tflan 인덱스.
+    def __init__(self, evaluator, population=32, elite=2, mutation_rate=0.1, tournament=2, seed=0):
+        self.evaluator = evaluator
+        self.groups = evaluator.valid_groups
+        self.n_options = np.array([len(options) for options in evaluator.options])
+        self.population = population
+        self.elite = elite
+        self.mutation_rate = mutation_rate
+        self.tournament = tournament
+        self.rng = np.random.default_rng(seed)
+
+        self.generation = 0
+        self.genomes = None
+        self.violations = None
+        self.weights = None
+        # 같은 유전자는 다시 평가하지 않는다. (violation, weight)
+        self.memo = {}
+
+    def design(self, genome):
+        return self.evaluator.design(genome)
+
+    def evaluate(self, genomes):
+        keys = [genome.tobytes() for genome in genomes]
+        todo = {}
+        for key, genome in zip(keys, genomes):
+            if key not in self.memo and key not in todo:
+                todo[key] = genome
+
+        results = self.evaluator.evaluate_many([self.design(genome) for genome in todo.values()])
+        failed = {}
+        for key, result in zip(todo, results):
+            # MARS 가 실패한 설계는 이번 세대에서만 최하위로 두고, 다음에 다시 나오면 다시 평가한다.
+            if result["ok"]:
+                self.memo[key] = (result["violation"], result["weight"])
+            else:
+                failed[key] = (result["violation"], result["weight"])
+
+        values = np.array([self.memo[key] if key in self.memo else failed[key] for key in keys], dtype=np.float64)
+        return values[:, 0], values[:, 1]
+
+    def mutate(self, genome, rate=None):
+        rate = self.mutation_rate if rate is None else rate
+        child = genome.copy()
+        mask = self.rng.random(child.shape) < rate
+        steps = self.rng.choice([-2, -1, 1, 2], size=child.shape)
+        child[mask] += steps[mask]
+        return np.clip(child, 0, self.n_options - 1)
+
+    def crossover(self, a, b):
+        # 그룹 단위 균등 교차
+        take = self.rng.random(len(self.groups)) < 0.5
+        return np.where(take[:, None], a, b)
+
+    def select(self, ranks):
+        idx = self.rng.integers(0, len(ranks), self.tournament)
+        return idx[np.argmin(ranks[idx])]
+
+    def initialize(self):
+        base = self.evaluator.genome()
+        genomes = [base]
+        while len(genomes) < self.population:
+            genomes.append(self.mutate(base, rate=0.3))
+        self.genomes = np.stack(genomes)
+        self.violations, self.weights = self.evaluate(self.genomes)
+
+    def step(self):
+        order = rank_order(self.violations, self.weights)
+        ranks = np.empty(len(order), dtype=np.int64)
+        ranks[order] = np.arange(len(order))
+
+        children = [self.genomes[i] for i in order[:self.elite]]
+        while len(children) < self.population:
+            a = self.genomes[self.select(ranks)]
+            b = self.genomes[self.select(ranks)]
+            children.append(self.mutate(self.crossover(a, b)))
+
+        self.genomes = np.stack(children)
+        self.violations, self.weights = self.evaluate(self.genomes)
+        self.generation += 1
+
+    def best(self):
+        i = rank_order(self.violations, self.weights)[0]
+        return self.genomes[i], self.violations[i], self.weights[i]
+
+    def save(self, path):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        memo_keys = list(self.memo)
+        save_npz(
+            path,
+            groups=self.groups,
+            options=json.dumps([list(options) for options in self.evaluator.options]),
+            generation=self.generation,
+            genomes=self.genomes,
+            violations=self.violations,
+            weights=self.weights,
+            rng_state=json.dumps(self.rng.bit_generator.state),
+            memo_genomes=np.array([np.frombuffer(k, dtype=np.int64) for k in memo_keys],
+                                  dtype=np.int64).reshape(len(memo_keys), self.genomes[0].size),
+            memo_values=np.array([self.memo[k] for k in memo_keys], dtype=np.float64),
+        )
+
+    def load(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            if not np.array_equal(data["groups"], self.groups):
+                raise ValueError(f"checkpoint 의 그룹 구성이 현재 설계와 다름: {path}")
+            # options 가 없는 checkpoint 는 TBAR_OPTIONS 로 만든 것이다.
+            options = json.loads(str(data["options"])) if "options" in data.files else TBAR_OPTIONS
+            if [list(map(float, v)) for v in options] != [list(map(float, v)) for v in self.evaluator.options]:
+                raise ValueError(f"checkpoint 의 치수 선택지가 현재 설정과 다름: {path}")
+            self.generation = int(data["generation"])
+            self.genomes = data["genomes"]
+            self.violations = data["violations"]
+            self.weights = data["weights"]
+            self.rng.bit_generator.state = json.loads(str(data["rng_state"]))
+            self.memo = {
+                genome.tobytes(): tuple(values)
+                for genome, values in zip(data["memo_genomes"], data["memo_values"])
+                if np.isfinite(values[0])
+            }
+
+
+def run_genetic(config_path):
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    ga_config = config.get("genetic") or {}
+
+    evaluator = DesignEvaluator(config, n_workers=ga_config.get("n_workers") or os.cpu_count(),
+                                batch_size=ga_config.get("batch_size", 1))
+    optimizer = GeneticOptimizer(
+        evaluator,
+        population=ga_config.get("population", 32),
+        elite=ga_config.get("elite", 2),
+        mutation_rate=ga_config.get("mutation_rate", 0.1),
+        tournament=ga_config.get("tournament", 2),
+        seed=ga_config.get("seed", 0),
+    )
+
+    checkpoint = ga_config.get("checkpoint", "./logs/ga_checkpoint.npz")
+    try:
+        if checkpoint and os.path.exists(checkpoint):
+            optimizer.load(checkpoint)
+            print(f"Resume generation {optimizer.generation}")
+        else:
+            optimizer.initialize()
+            if checkpoint:
+                optimizer.save(checkpoint)
+
+        generations = ga_config.get("generations", 50)
+        while optimizer.generation < generations:
+            optimizer.step()
+            if checkpoint:
+                optimizer.save(checkpoint)
+
+            _, violation, weight = optimizer.best()
+            n_feasible = int((optimizer.violations == 0).sum())
+            print(f"[gen {optimizer.generation}] best weight: {weight:.1f}, violation: {violation:.4f}, "
+                  f"feasible: {n_feasible}/{optimizer.population}, solver calls: {evaluator.solver_calls}")
+
+        genome, violation, weight = optimizer.best()
+        design = optimizer.design(genome)
+        output_path = ga_config.get("output_path")
+        if output_path:
+            evaluator.write_design(design, config["temp_path"], output_path)
+            print("Saved", output_path)
+    finally:
+        evaluator.close()
+
+    return design, violation, weight
+
+
+if __name__ == "__main__":
+    run_genetic(sys.argv[1] if len(sys.argv) > 1 else "data/config.json")
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+
+import numpy as np
+
+from optim.evaluator import DesignEvaluator
+
+
+def smaller_moves(genome):
+    # 그룹마다, 치수마다 한 단계 작은 값으로 바꾸는 수. (그룹 위치, 치수 위치)
+    rows, cols = np.nonzero(genome > 0)
+    return list(zip(rows.tolist(), cols.tolist()))
+
+
+def apply_moves(genome, moves):
+    child = genome.copy()
+    for i, j in moves:
+        child[i, j] -= 1
+    return child
+
+
+def greedy_reduce(evaluator, genome, max_rounds=20):
+    # 라운드마다 모든 한 단계 축소안을 병렬로 평가하고, 위반이 늘지 않으면서 가벼워지는 수를 받아들인다.
+    # 서로 다른 그룹의 좋은 수를 한꺼번에 적용해 보고, 그 조합이 위반을 늘리면 가장 좋은 한 수만 적용한다.
+    # 라운드 0 은 입력 설계 그대로 평가하고, 이후에는 genome 에서 바뀐 그룹만 설계에 담는다.
+    initial = genome
+    current = evaluator.evaluate({})
+    print(f"[greedy 0] weight: {current['weight']:.1f}, violation: {current['violation']:.4f}")
+
+    for round_idx in range(1, max_rounds + 1):
+        moves = smaller_moves(genome)
+        if not moves:
+            break
+
+        candidates = [apply_moves(genome, [move]) for move in moves]
+        results = evaluator.evaluate_many([evaluator.design(c, initial) for c in candidates])
+
+        good = [
+            (current["weight"] - result["weight"], k)
+            for k, result in enumerate(results)
+            if result["ok"] and result["violation"] <= current["violation"] and result["weight"] < current["weight"]
+        ]
+        if not good:
+            break
+        good.sort(reverse=True)
+
+        best_saving, best = good[0]
+        chosen, used_groups = [], set()
+        for _, k in good:
+            group_pos = moves[k][0]
+            if group_pos not in used_groups:
+                used_groups.add(group_pos)
+                chosen.append(moves[k])
+
+        accepted = False
+        if len(chosen) > 1:
+            combined = apply_moves(genome, chosen)
+            result = evaluator.evaluate(evaluator.design(combined, initial))
+            if result["ok"] and result["violation"] <= current["violation"] and result["weight"] < results[best]["weight"]:
+                genome, current, accepted = combined, result, True
+                n_moves = len(chosen)
+        if not accepted:
+            genome, current = candidates[best], results[best]
+            n_moves = 1
+
+        print(f"[greedy {round_idx}] weight: {current['weight']:.1f}, violation: {current['violation']:.4f}, "
+              f"moves: {n_moves}/{len(good)}, solver calls: {evaluator.solver_calls}")
+
+    return genome, current
+
+
+def run_greedy(config_path, input_path=None, output_path=None):
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    greedy_config = config.get("greedy") or {}
+    input_path = input_path or greedy_config.get("input_path") or config["input_path"]
+    output_path = output_path or greedy_config.get("output_path") or input_path
+
+    evaluator = DesignEvaluator(config, n_workers=greedy_config.get("n_workers") or os.cpu_count(), prefix="greedy",
+                                batch_size=greedy_config.get("batch_size", 1), source_path=input_path)
+    try:
+        initial = evaluator.genome()
+        genome, result = greedy_reduce(evaluator, initial, max_rounds=greedy_config.get("max_rounds", 20))
+
+        design = evaluator.design(genome, initial)
+        evaluator.write_design(design, input_path, output_path)
+        print("Saved", output_path)
+    finally:
+        evaluator.close()
+    return design, result
+
+
+if __name__ == "__main__":
+    run_greedy(
+        sys.argv[1] if len(sys.argv) > 1 else "data/config.json",
+        sys.argv[2] if len(sys.argv) > 2 else None,
+        sys.argv[3] if len(sys.argv) > 3 else None,
+    )
@@ -0,0 +1,143 @@
+import os
+import shutil
+import multiprocessing as mp
+
+import numpy as np
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+def _eval_worker(conn, algo, config_path, rank, max_steps, n_episodes, deterministic, use_masks):
+    # 별도 프로세스에서 자기 작업 폴더(rank)를 쓰는 환경을 만들고, 받은 스냅샷을 평가해 돌려준다.
+    from rl.rl_env import ScantlingOptEnv
+
+    env = ScantlingOptEnv(config_path=config_path, max_steps=max_steps, rank=rank)
+    try:
+        while True:
+            message = conn.recv()
+            if message is None:
+                break
+            timesteps, path = message
+
+            model = algo.load(path, device="cpu")
+            returns, lengths = [], []
+            for _ in range(n_episodes):
+                obs, _ = env.reset()
+                done, total, length = False, 0.0, 0
+                while not done:
+                    kwargs = {"action_masks": env.action_masks()} if use_masks else {}
+                    action, _ = model.predict(obs, deterministic=deterministic, **kwargs)
+                    obs, reward, terminated, truncated, _ = env.step(action)
+                    total += reward
+                    length += 1
+                    done = terminated or truncated
+                returns.append(total)
+                lengths.append(length)
+            conn.send((timesteps, path, returns, lengths))
+    finally:
+        env.close()
+        conn.close()
+
+
+class AsyncEvalCallback(BaseCallback):
+    # EvalCallback 과 같은 역할이지만 학습을 멈추지 않는다.
+    # eval_freq 마다 정책을 스냅샷으로 저장해 평가 프로세스에 넘기고, 끝난 결과는 다음 스텝에서 받아 처리한다.
+    # 평가 프로세스가 아직 이전 스냅샷을 평가 중이면 이번 스냅샷은 건너뛴다.
+    def __init__(self, config_path, rank, eval_freq=20, n_eval_episodes=1, max_steps=20,
+                 best_model_save_path="./logs/best_model/", log_path="./logs/eval/",
+                 deterministic=True, use_masks=False, verbose=1):
+        super().__init__(verbose)
+        self.config_path = config_path
+        self.rank = rank
+        self.eval_freq = eval_freq
+        self.n_eval_episodes = n_eval_episodes
+        self.max_steps = max_steps
+        self.best_model_save_path = best_model_save_path
+        self.log_path = log_path
+        self.snapshot_dir = os.path.join(log_path, "snapshots")
+        self.deterministic = deterministic
+        self.use_masks = use_masks
+
+        self.best_mean_reward = -np.inf
+        self.last_mean_reward = -np.inf
+        self.evaluations_timesteps = []
+        self.evaluations_results = []
+        self.evaluations_length = []
+        self.process = None
+        self.conn = None
+        self.pending = None
+
+    def _init_callback(self):
+        for d in (self.best_model_save_path, self.log_path, self.snapshot_dir):
+            os.makedirs(d, exist_ok=True)
+
+        # MARS 실행 파일과 CUDA 가 fork 된 상태를 물려받지 않도록 spawn 으로 띄운다.
+        ctx = mp.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_eval_worker,
+            args=(child_conn, type(self.model), self.config_path, self.rank, self.max_steps,
+                  self.n_eval_episodes, self.deterministic, self.use_masks),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def _on_step(self):
+        self._collect()
+
+        if self.n_calls % self.eval_freq == 0 and self.pending is None:
+            path = os.path.join(self.snapshot_dir, f"snapshot_{self.num_timesteps}.zip")
+            self.model.save(path)
+            self.conn.send((self.num_timesteps, path))
+            self.pending = path
+        return True
+
+    def _collect(self, block=False):
+        while self.pending is not None and (block or self.conn.poll()):
+            try:
+                timesteps, path, returns, lengths = self.conn.recv()
+            except EOFError:
+                print("[WARN] 평가 프로세스가 종료됨")
+                self.pending = None
+                return
+            self.pending = None
+            self._record(timesteps, path, returns, lengths)
+
+    def _record(self, timesteps, path, returns, lengths):
+        mean_reward, std_reward = float(np.mean(returns)), float(np.std(returns))
+        self.last_mean_reward = mean_reward
+
+        self.evaluations_timesteps.append(timesteps)
+        self.evaluations_results.append(returns)
+        self.evaluations_length.append(lengths)
+        np.savez(
+            os.path.join(self.log_path, "evaluations"),
+            timesteps=self.evaluations_timesteps,
+            results=self.evaluations_results,
+            ep_lengths=self.evaluations_length,
+        )
+
+        if self.verbose >= 1:
+            print(f"Eval snapshot num_timesteps={timesteps}, episode_reward={mean_reward:.2f} +/- {std_reward:.2f}")
+        self.logger.record("eval/mean_reward", mean_reward)
+        self.logger.record("eval/mean_ep_length", float(np.mean(lengths)))
+        self.logger.record("eval/snapshot_timesteps", timesteps)
+
+        if mean_reward > self.best_mean_reward:
+            if self.verbose >= 1:
+                print("New best mean reward!")
+            self.best_mean_reward = mean_reward
+            shutil.copy(path, os.path.join(self.best_model_save_path, "best_model.zip"))
+        os.remove(path)
+
+    def _on_training_end(self):
+        self._collect(block=True)
+        if self.process is not None:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=60)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
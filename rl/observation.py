@@ -0,0 +1,45 @@
+import numpy as np
+
+
+class ObservationBuilder:
+    # 관측 행렬의 모양과 각 행이 참조할 margin 위치를 처음 한 번만 계산해 두고,
+    # 매 스텝에는 미리 잡아둔 float32 버퍼만 채운다.
+    # columns: [group, hweb_idx, tweb_idx, hflan_idx, tflan_idx, margin]
+    def __init__(self, df_stiff, margin_index, catalogs, n_groups, stiff_type=4):
+        self.rows = np.flatnonzero(df_stiff["Type"].to_numpy() == stiff_type)
+        self.catalogs = [np.asarray(values, dtype=np.float64) for values in catalogs]
+
+        positions = {key: i for i, key in enumerate(margin_index)}
+        panels = df_stiff["Ipan"].to_numpy()[self.rows]
+        stiffeners = df_stiff["stiff_index"].to_numpy()[self.rows]
+        self.margin_pos = np.array(
+            [positions.get((int(p), int(s)), -1) for p, s in zip(panels, stiffeners)],
+            dtype=np.int64,
+        )
+        self.has_margin = self.margin_pos >= 0
+
+        self.buffer = np.zeros((len(self.rows), 2 + len(self.catalogs)), dtype=np.float32)
+        self.buffer[:, 0] = df_stiff["group"].to_numpy()[self.rows] / max(n_groups - 1, 1)
+
+    @property
+    def shape(self):
+        return self.buffer.shape
+
+    def _catalog_index(self, catalog, values):
+        # 목록에 없는 값이 들어와도 가장 가까운 항목의 인덱스를 쓴다.
+        idx = np.clip(np.searchsorted(catalog, values), 1, len(catalog) - 1)
+        idx -= values - catalog[idx - 1] < catalog[idx] - values
+        return idx
+
+    def build(self, specs, margins):
+        specs = specs[self.rows]
+        for j, catalog in enumerate(self.catalogs):
+            if len(catalog) > 1:
+                self.buffer[:, 1 + j] = self._catalog_index(catalog, specs[:, j]) / (len(catalog) - 1)
+
+        margin = np.zeros(len(self.rows), dtype=np.float64)
+        margin[self.has_margin] = margins[self.margin_pos[self.has_margin]]
+        margin = np.nan_to_num(margin, nan=0.0)
+        self.buffer[:, -1] = np.sign(margin) * np.log1p(np.abs(margin))
+
+        return self.buffer.copy()
@@ -1,50 +1,148 @@
 import os
-import shutil
 import json
 import pandas as pd
 import numpy as np
 import gymnasium as gym
 from gymnasium import spaces
 
-from utils.parser import parse_ma2, update_stiff_scant_in_ma2
-from utils.mars import run_mars, evaluate_rule, compute_margin
-from utils.processing import group_stiff, update_group_value
+from utils.parser import Ma2Index, Ma2Template, SPEC_POSITIONS
+from utils.solver import get_solver, SolverError
+from utils.mars import run_mars_parsed, RuleEngine, DEFAULT_EXCLUDED_STIFFENERS, UNCHECKED_MARGIN
+from utils.cache import MarsCache, file_digest, solver_salt, pack_result, unpack_result
+from utils.workspace import make_worker_config
+from utils.processing import group_stiff
+from utils.timing import PhaseTimer
+from utils.prescreen import SectionPrescreen, CERTAIN_FAIL
+from utils.weight import WeightTracker, stiffener_spans, STEEL_DENSITY
+from utils.experience import ExperienceStore
+from utils.catalog import TBAR_TYPE, load_tbar_catalog, action_options, group_count, valid_group_mask
+from utils.design import DesignLayout
+from utils.snapshot import snapshot_key, load_snapshot, save_snapshot
+from rl.surrogate import MarginSurrogate
+from rl.observation import ObservationBuilder
 
 
 def load_action_data(config):
-    tbar_df = pd.read_csv(config["tbar"])
-    return tbar_df
+    return load_tbar_catalog(config)
 
 
 class ScantlingOptEnv(gym.Env):
     metadata = {"render_modes": ["human"]}
 
-    def __init__(self, config_path, max_steps=40):
+    def __init__(self, config_path, max_steps=40, rank=None):
         super().__init__()
 
         with open(config_path, "r") as f:
             self.config = json.load(f)
 
-        parsed = parse_ma2(self.config["input_path"])
-        self.df_scant = parsed["stiff scant"]
-        self.df_stiff_loc = parsed["stiff loc"]
-        self.df_stiff_new = group_stiff(self.df_scant, self.df_stiff_loc)
+        self.base_config = self.config
+        self.rank = rank
+        self.n_relocations = 0
+        if rank is not None:
+            self.config = make_worker_config(self.config, rank)
+        self.solver = get_solver(self.config, direct=self.config.get("pipelined", False))
+
+        self.design_salt = file_digest(self.config["temp_path"])
+
+        self.cache = None
+        if self.config.get("cache_dir"):
+            self.cache = MarsCache(self.config["cache_dir"], self.config.get("cache_max_entries", 5000))
+            self.cache_salt = solver_salt(self.config, self.design_salt)
+
+        self.experience = None
+        experience_config = self.config.get("experience") or {}
+        if experience_config.get("dir"):
+            self.experience = ExperienceStore(
+                experience_config["dir"],
+                salt=self.design_salt,
+                chunk_size=experience_config.get("chunk_size", 256),
+                tag="" if rank is None else f"w{rank}_",
+            )
+
+        self.surrogate = None
+        self.surrogate_config = self.config.get("surrogate") or {}
+        if self.surrogate_config.get("enabled", False):
+            self.surrogate = MarginSurrogate(
+                n_models=self.surrogate_config.get("n_models", 5),
+                l2=self.surrogate_config.get("l2", 1.0),
+            )
+        self.steps_since_solver = 0
+        self.solver_calls = 0
+        self.prescreen = None
+
+        trace_path = self.config.get("trace_path")
+        if trace_path and rank is not None:
+            root, ext = os.path.splitext(trace_path)
+            trace_path = f"{root}_w{rank}{ext}"
+        self.timer = PhaseTimer(trace_path)
+
+        # 기준 설계(temp.ma2)를 한 번만 읽고 평가해 두고, reset 때는 메모리에서 복원한다.
+        # input_path 는 MARS 를 실제로 돌려야 할 때만 현재 설계로 다시 쓴다.
+        # snapshot_dir 이 있으면 temp.ma2 내용 해시로 저장해 둔 표와 기준 결과를 써서 MARS 를 돌리지 않는다.
+        snapshot = None
+        self.snapshot_dir = self.config.get("snapshot_dir")
+        if self.snapshot_dir:
+            self.snapshot_key = snapshot_key(self.design_salt, self.config)
+            snapshot = load_snapshot(self.snapshot_dir, self.snapshot_key)
+        tables, baseline_result = snapshot if snapshot is not None else (None, None)
+        self._load_ma2(self.config["temp_path"], tables)
+
+        prescreen_config = self.config.get("prescreen") or {}
+        if prescreen_config.get("enabled", False):
+            self.prescreen = SectionPrescreen(
+                self.df_stiff["Ipan"].to_numpy(),
+                self.df_stiff["stiff_index"].to_numpy(),
+                tolerance=prescreen_config.get("tolerance", 0.1),
+                plate_breadth=prescreen_config.get("plate_breadth", 800.0),
+                plate_thick=prescreen_config.get("plate_thick", 14.0),
+                corrosion=prescreen_config.get("corrosion", 1.0),
+            )
+
+        catalog = load_action_data(self.config)
+        self.hweb_list, self.tweb_list, self.hflan_list, self.tflan_list = [
+            list(v) for v in action_options(self.config, catalog)
+        ]
 
-        self.hweb_list = [350, 375, 400, 425, 450, 475, 500, 525, 550, 575, 600, 625, 650, 675, 700, 725, 750, 775]
-        self.tweb_list = [11, 11.5, 12, 12.25, 12.5, 13, 13.5, 14, 14.25, 14.5, 15, 15.5, 16]
-        self.hflan_list = [125, 150, 175, 200]
-        self.tflan_list = [round(x, 2) for x in np.arange(11.5, 29.5 + 0.001, 0.25)]
+        # 그룹 수는 STIFF LOC 에서, 선택 가능한 그룹은 T-bar 가 들어 있는 그룹으로 정한다.
+        self.n_groups = group_count(self.df_stiff_loc)
+        self.valid_groups = valid_group_mask(self.df_stiff, self.n_groups, TBAR_TYPE)
+        self.catalog = catalog if self.config.get("snap_to_catalog", False) else None
 
         self.action_space = spaces.MultiDiscrete([
-            59,
+            self.n_groups,
             len(self.hweb_list),
             len(self.tweb_list),
             len(self.hflan_list),
             len(self.tflan_list)
         ])
 
-        df_eval = self._parse_and_eval()
-        margin = compute_margin(df_eval)
+        self.rules = RuleEngine(self.config.get("excluded_stiffeners", DEFAULT_EXCLUDED_STIFFENERS))
+
+        if baseline_result is None:
+            baseline_result = self._baseline_result()
+            if self.snapshot_dir:
+                try:
+                    save_snapshot(self.snapshot_dir, self.snapshot_key, self._tables, baseline_result)
+                except OSError as e:
+                    print(f"[WARN] snapshot 저장 실패: {e}")
+        self.steps_since_solver = 0
+        margin, _ = self._evaluate_result(baseline_result)
+        self._tables = None
+        self.margin_index = margin.index
+        positions = {key: i for i, key in enumerate(self.margin_index)}
+        self.row_margin_pos = np.array([
+            positions.get((int(p), int(s)), -1)
+            for p, s in zip(self.df_stiff["Ipan"], self.df_stiff["stiff_index"])
+        ], dtype=np.int64)
+        self._record_sample(margin)
+
+        self.observer = ObservationBuilder(
+            self.df_stiff,
+            self.margin_index,
+            [self.hweb_list, self.tweb_list, self.hflan_list, self.tflan_list],
+            n_groups=self.n_groups,
+            stiff_type=TBAR_TYPE,
+        )
         obs = self._get_observation(margin)
 
         self.observation_space = spaces.Box(
@@ -53,111 +151,384 @@ class ScantlingOptEnv(gym.Env):
 
         self.max_steps = max_steps
         self.current_step = 0
-        self.prev_weight = self._compute_weight(self.df_stiff_new)
+        self.weights = WeightTracker(
+            self.layout.baseline_specs,
+            stiffener_spans(self.df_stiff, self.config.get("stiffener_span", 1.0)),
+            self.layout.row_group,
+            self.df_stiff["Ipan"].to_numpy(),
+            density=self.config.get("steel_density", STEEL_DENSITY),
+        )
+        self.prev_weight = self._compute_weight()
         # self.prev_weight = None
         self.prev_fail = None
         self.selected_group = 0
+        self._pending = None
+        self.last_margin = margin
+        self.last_fail = int((margin < 0).sum())
+        self.last_obs = obs
+
+        self.baseline = {
+            "weight": self.prev_weight,
+            "margin": margin,
+            "fail": self.last_fail,
+            "obs": obs,
+        }
+        self.timer.discard_step()
 
     def reset(self, seed=None, options=None):
-        input_path = self.config["input_path"]
-        if os.path.exists(input_path):
-            os.remove(input_path)
+        super().reset(seed=seed)
 
-        temp_path = self.config["temp_path"]
-        shutil.copy(temp_path, input_path)
-
-        parsed = parse_ma2(input_path)
-        self.df_scant = parsed["stiff scant"]
-        self.df_stiff_loc = parsed["stiff loc"]
-        self.df_stiff_new = group_stiff(self.df_scant, self.df_stiff_loc)
+        self.design.reset()
+        self.specs[:] = self.layout.baseline_specs
+        self.template.reset()
+        self.weights.reset()
         self.current_step = 0
-        self.prev_weight = self._compute_weight(self.df_stiff_new)
+        self.prev_weight = self.baseline["weight"]
         self.prev_fail = 0
+        self._pending = None
+        self.last_margin = self.baseline["margin"]
+        self.last_fail = self.baseline["fail"]
+        self.last_obs = self.baseline["obs"]
 
-        df_eval = self._parse_and_eval()
-        margin = compute_margin(df_eval)
-        obs = self._get_observation(margin)
-        return obs.astype(np.float32), {}
+        return self.baseline["obs"].copy(), {}
 
     def step(self, action):
+        if self.prepare_step(action):
+            try:
+                result = run_mars_parsed(self.config, sections=("stiffener",), timer=self.timer,
+                                         solver=self.solver)
+            except SolverError as error:
+                return self.fail_step(error)
+            return self.complete_step(result)
+        return self.complete_step()
+
+    def action_masks(self):
+        # MultiDiscrete 차원별 마스크를 이어 붙인 형태 (sb3-contrib MaskablePPO 형식)
+        masks = [self.valid_groups]
+        masks.extend(np.ones(n, dtype=bool) for n in self.action_space.nvec[1:])
+        return np.concatenate(masks)
+
+    def prepare_step(self, action):
+        # MARS 실행이 필요하면 True 를 돌려준다. 그 경우 호출한 쪽에서 solver 를 돌리고
+        # 파싱한 결과를 complete_step(result) 로 넘긴다. (PipelinedVecEnv 에서 사용)
         self.current_step += 1
 
-        target_group = action[0]
+        action = np.asarray(action, dtype=np.int64)
+        target_group = int(action[0])
         selected_spec = [
             self.hweb_list[action[1]],
             self.tweb_list[action[2]],
             self.hflan_list[action[3]],
             self.tflan_list[action[4]]
         ]
+        if self.catalog is not None:
+            selected_spec = self.catalog.snap(selected_spec)[0].tolist()
+
+        # T-bar 가 없는 그룹이거나 지금과 같은 치수면 설계가 바뀌지 않으므로 MARS 를 돌리지 않는다.
+        if not self.valid_groups[target_group] or not self.design.set(target_group, selected_spec):
+            self._pending = {"group": target_group, "margin": self.last_margin, "fail": self.last_fail, "noop": True,
+                             "action": action}
+            return False
+
+        g_idx = self.layout.rows(target_group)
+        current = self.specs[g_idx]
+        snapshot = self.template.snapshot(g_idx)
+        self.specs[g_idx] = selected_spec
+
+        self.template.set_values(g_idx, SPEC_POSITIONS, selected_spec)
+        self.weights.update(g_idx, self.specs[g_idx])
+        self._pending = {"group": target_group, "action": action,
+                         "rows": g_idx, "previous": current, "snapshot": snapshot}
+
+        # 캐시에 있는 MARS 결과가 가장 정확하므로 추정(prescreen, surrogate)보다 먼저 본다.
+        key = self._cache_key()
+        result = self._cached_result(key)
+        if result is not None:
+            self._pending["result"] = result
+            return False
+
+        if self.prescreen is not None:
+            with self.timer.phase("prescreen"):
+                margin = self._prescreen_margin(g_idx)
+            if margin is not None:
+                self._pending["margin"] = margin
+                return False
+
+        if self.surrogate is not None:
+            with self.timer.phase("surrogate"):
+                margin = self._predict_margin()
+            if margin is not None:
+                self._pending["margin"] = margin
+                return False
+
+        self._pending["key"] = key
+        with self.timer.phase("write"):
+            self.template.write(self.config["input_path"])
+        return True
+
+    def complete_step(self, result=None, timings=None):
+        pending, self._pending = self._pending, None
+        target_group = pending["group"]
+        for name, seconds in (timings or {}).items():
+            self.timer.add(name, seconds)
+
+        used_solver = False
+        if "margin" in pending:
+            margin = pending["margin"]
+            n_fail = pending.get("fail", int((margin < 0).sum()))
+            if not pending.get("noop", False) and pending.get("screen") != CERTAIN_FAIL:
+                self.steps_since_solver += 1
+        else:
+            if result is None:
+                result = pending["result"]
+            else:
+                used_solver = True
+                self.solver_calls += 1
+                if self.cache is not None:
+                    with self.timer.phase("cache"):
+                        self.cache.put(pending["key"], pack_result(result))
+
+            margin, n_fail = self._evaluate_result(result)
+            self.steps_since_solver = 0
+            # 캐시 결과는 이미 학습한 (설계, margin) 이므로 MARS 를 새로 돌린 결과만 surrogate 에 넣는다.
+            if used_solver:
+                with self.timer.phase("surrogate"):
+                    self._record_sample(margin)
+        self.last_margin, self.last_fail = margin, n_fail
 
-        g_bool = (self.df_stiff_new["group"] == target_group)
-        g_idx = np.where(g_bool)[0]
-        cols = [4, 5, 6, 7]
-        for col_idx, spec in zip(cols, selected_spec):
-            self.df_stiff_new.iloc[g_idx, col_idx] = spec
-
-        update_stiff_scant_in_ma2(
-            self.config["input_path"],
-            self.config["input_path"],
-            self.df_stiff_new.iloc[:, 2:]
-        )
-
-        df_eval_new = self._parse_and_eval()
-        margin = compute_margin(df_eval_new)
         reward, terminated = self._compute_reward(margin, target_group)
-        df_fail = df_eval_new[df_eval_new["pass"] == False]
-        print(f'[step {self.current_step}], reward: {round(reward, 2)}, modify group: {target_group}, fail: {df_fail.shape[0]}')
+        print(f'[step {self.current_step}], reward: {round(reward, 2)}, modify group: {target_group}, fail: {n_fail}')
 
         truncated = self.current_step >= self.max_steps
-        obs = self._get_observation(margin)
+        with self.timer.phase("observation"):
+            obs = self._get_observation(margin)
         self.selected_group = target_group
-
-        return obs, reward, terminated, truncated, {}
-
-    def _parse_and_eval(self):
-        _, _, df_stiffener = run_mars(self.config)
-        return evaluate_rule(df_stiffener)
-
-    def _get_observation(self, df_margin):
-        df_margin = df_margin.reset_index()
-        df_margin.columns = ["panel", "stiffener", "margin"]
-        df_margin["stiffener"] = df_margin["stiffener"].astype(int)
-
-        # columns: [Ipan, type, group, stiff_index, hweb, tweb, hflan, tflan]
-        obs_cols = [2, 3, 0, 1, 4, 5, 6, 7]
-        df_obs = self.df_stiff_new.iloc[:, obs_cols].copy()
-        df_obs = df_obs[df_obs["Type"] == str(4)]
-        df_obs["panel"] = df_obs["Ipan"]
-        df_obs["stiffener"] = df_obs["stiff_index"]
-        df_obs = df_obs.merge(df_margin, on=["panel", "stiffener"], how="left").astype(float)
-        df_obs = df_obs.dropna(subset=["margin"])
-
-        df_obs["hweb_idx"] = df_obs["hweb"].apply(lambda x: self.hweb_list.index(x))
-        df_obs["tweb_idx"] = df_obs["tweb"].apply(lambda x: self.tweb_list.index(x))
-        df_obs["hflan_idx"] = df_obs["hflan"].apply(lambda x: self.hflan_list.index(x))
-        df_obs["tflan_idx"] = df_obs["tflan"].apply(lambda x: self.tflan_list.index(x))
-        cols = ["group", "hweb_idx", "tweb_idx", "hflan_idx", "tflan_idx", "margin"]
-
-        return df_obs[cols].to_numpy(dtype=np.float32)
+        if self.experience is not None:
+            self._record_experience(pending, margin, reward, terminated or truncated, used_solver)
+        self.last_obs = obs
+
+        info = {"solver_called": used_solver, "solver_calls": self.solver_calls, "noop": pending.get("noop", False), "weight": self._compute_weight()}
+        if self.prescreen is not None:
+            info["prescreen"] = pending.get("screen")
+        if self.cache is not None:
+            info["cache_hit_rate"] = self.cache.stats()["hit_rate"]
+        info.update(self._solver_metrics())
+
+        step_times = self.timer.end_step()
+        info["timing"] = step_times
+        info.update({f"t_{name}": value for name, value in step_times.items()})
+        if terminated or truncated:
+            info.update(self.timer.end_episode())
+
+        return obs, reward, terminated, truncated, info
+
+    def fail_step(self, error):
+        # MARS 가 재시도까지 실패하면 이번 변경을 되돌리고 벌점과 함께 에피소드를 끊는다.
+        pending, self._pending = self._pending, None
+        rows = pending["rows"]
+        self.design.undo()
+        self.specs[rows] = pending["previous"]
+        self.template.restore(pending["snapshot"])
+        self.weights.update(rows, pending["previous"])
+
+        reward = float(self.config.get("solver_failure_penalty", -10.0))
+        print(f'[step {self.current_step}], solver failed ({error.kind}), modify group: {pending["group"]}')
+        # 에피소드가 여기서 끊기므로 끝 행을 남겨 다음 에피소드와 return 이 이어지지 않게 한다.
+        # 설계는 되돌렸으므로 치수와 margin 은 마지막으로 평가한 설계의 값이다.
+        if self.experience is not None:
+            self._record_experience(pending, self.last_margin, reward, True, False)
+        if self.solver.quarantined:
+            self._relocate_workspace()
+
+        info = {"solver_called": True, "solver_failed": True, "solver_error": error.kind,
+                "solver_calls": self.solver_calls, "noop": False, "weight": self._compute_weight()}
+        info.update(self._solver_metrics())
+        step_times = self.timer.end_step()
+        info["timing"] = step_times
+        info.update({f"t_{name}": value for name, value in step_times.items()})
+        info.update(self.timer.end_episode())
+        return self.last_obs.copy(), reward, False, True, info
+
+    def _relocate_workspace(self):
+        # 격리된 작업 폴더는 그대로 두고 새 작업 폴더로 옮겨 학습을 이어간다.
+        self.n_relocations += 1
+        name = f"q{self.n_relocations}" if self.rank is None else f"{self.rank}_q{self.n_relocations}"
+        metrics = self.solver.metrics
+        self.config = make_worker_config(self.base_config, name)
+        self.solver = get_solver(self.config, direct=self.config.get("pipelined", False))
+        self.solver.metrics = metrics
+        print(f"[WARN] 새 작업 폴더로 이동: {self.config['mars_path']}")
+
+    def _solver_metrics(self):
+        return {f"solver_{name}": value for name, value in self.solver.metrics.items()}
+
+    def close(self):
+        if self.experience is not None:
+            self.experience.flush()
+        super().close()
+
+    def _record_experience(self, pending, margin, reward, done, used_solver):
+        # 행동을 고른 시점의 관측과 그 결과(치수, margin, 무게, 보상)를 한 행으로 남긴다.
+        if not margin.index.equals(self.margin_index):
+            margin = margin.reindex(self.margin_index)
+        margins = margin.to_numpy(dtype=np.float32)
+        self.experience.add(
+            obs=self.last_obs,
+            action=pending["action"],
+            specs=self.specs.astype(np.float32),
+            margin=margins,
+            passed=~(margins < 0),
+            weight=self._compute_weight(),
+            reward=float(reward),
+            done=bool(done),
+            solver=used_solver,
+            estimated="margin" in pending and not pending.get("noop", False),
+        )
+        if done:
+            self.experience.flush()
+
+    def _load_ma2(self, path, tables=None):
+        # 전체 선박 모델이어도 env 에 필요한 두 섹션만 파싱한다.
+        if tables is None:
+            with Ma2Index(path) as index:
+                tables = {name: index.table(name) for name in ("stiff scant", "stiff loc")}
+        self._tables = tables
+        scant_table = tables["stiff scant"]
+        self.df_scant = scant_table.to_frame()
+        self.df_stiff_loc = tables["stiff loc"].to_frame()
+        # df_stiff 는 기준 설계 그대로 두고 (그룹, 패널 번호 등 고정 정보만 참조),
+        # 현재 설계는 그룹별 치수 코드(design)와 행별 치수 배열(specs)로 들고 있다.
+        self.df_stiff = group_stiff(self.df_scant, self.df_stiff_loc)
+
+        # hweb, tweb, hflan, tflan 은 실수 값으로 바뀌므로 처음부터 float 로 둔다.
+        self.spec_columns = self.df_stiff.columns[4:8]
+        self.df_stiff[self.spec_columns] = self.df_stiff[self.spec_columns].astype(np.float64)
+        self.template = Ma2Template(path, scant_table, len(self.df_stiff))
+
+        groups = self.df_stiff["group"].to_numpy()
+        self.layout = DesignLayout(groups, self.df_stiff[self.spec_columns].to_numpy(), group_count(self.df_stiff_loc))
+        self.design = self.layout.state()
+        self.specs = self.layout.baseline_specs.copy()
+        self.group_of = {
+            (int(p), int(s)): int(g)
+            for p, s, g in zip(self.df_stiff["Ipan"], self.df_stiff["stiff_index"], groups)
+        }
+
+        _, self.group_inverse = np.unique(groups, return_inverse=True)
+        self.group_counts = np.bincount(self.group_inverse)
+
+    @property
+    def df_stiff_new(self):
+        # 현재 설계의 STIFF SCANT 표 (그룹, stiff_index 열 포함). 호출할 때마다 새로 만든다.
+        return self.design.frame(self.df_stiff, self.spec_columns)
+
+    def _cache_key(self):
+        if self.cache is None:
+            return None
+        return self.template.key(self.cache_salt)
+
+    def _cached_result(self, key):
+        if self.cache is None:
+            return None
+        with self.timer.phase("cache"):
+            arrays = self.cache.get(key)
+        if arrays is None:
+            return None
+        return unpack_result(arrays, ("stiffener",))
+
+    def _baseline_result(self):
+        key = self._cache_key()
+        result = self._cached_result(key)
+        if result is None:
+            with self.timer.phase("write"):
+                self.template.write(self.config["input_path"])
+            result = run_mars_parsed(self.config, sections=("stiffener",), timer=self.timer,
+                                     solver=self.solver)
+            if self.cache is not None:
+                with self.timer.phase("cache"):
+                    self.cache.put(key, pack_result(result))
+        return result
+
+    def _evaluate_result(self, result):
+        with self.timer.phase("evaluate"):
+            evaluation = self.rules.evaluate(result, mode="stiff")
+            margin = self._compute_margin(evaluation)
+            if self.prescreen is not None:
+                self.prescreen.calibrate(self.specs, result["items"], evaluation)
+        # 실패 수는 추정/no-op 스텝, _compute_reward 와 같이 margin 이 음수인 stiffener 수로 센다.
+        return margin, int((margin < 0).sum())
+
+    def _design_features(self):
+        # 플랜지가 없는 형식(flat bar 등)은 hflan/tflan 이 nan 이므로 0 으로 본다. (profile_area 와 같음)
+        specs = np.nan_to_num(self.specs)
+        sums = [np.bincount(self.group_inverse, weights=specs[:, j]) for j in range(specs.shape[1])]
+        return np.concatenate(sums) / np.tile(self.group_counts, specs.shape[1])
+
+    def _predict_margin(self):
+        if not self.surrogate.fitted:
+            return None
+        if self.steps_since_solver + 1 >= self.surrogate_config.get("verify_every", 10):
+            return None
+
+        mean, std = self.surrogate.predict(self._design_features())
+        if not (np.isfinite(mean).all() and np.isfinite(std).all()):
+            return None
+        if std.max() > self.surrogate_config.get("max_std", 5.0):
+            return None
+
+        # 실패가 없다고 예측되면 에피소드가 끝날 수 있으므로 반드시 MARS 로 확인한다.
+        if not (mean < 0).any():
+            return None
+
+        return pd.Series(mean, index=self.margin_index, name="margin")
+
+    def _prescreen_margin(self, g_idx):
+        # 단면 근사로 확실히 실패하는 변경이면 MARS 없이 추정 margin 을 돌려준다.
+        status, row_margins = self.prescreen.classify(g_idx, self.specs[g_idx])
+        self._pending["screen"] = status
+        if status != CERTAIN_FAIL:
+            return None
+
+        margin = self.last_margin.reindex(self.margin_index).to_numpy(dtype=np.float64).copy()
+        pos = self.row_margin_pos[g_idx]
+        keep = (pos >= 0) & np.isfinite(row_margins)
+        margin[pos[keep]] = row_margins[keep]
+        return pd.Series(margin, index=self.margin_index, name="margin")
+
+    def _record_sample(self, margin):
+        if self.surrogate is None:
+            return
+
+        y = margin.reindex(self.margin_index).to_numpy(dtype=np.float64)
+        self.surrogate.add(self._design_features(), np.nan_to_num(y, nan=UNCHECKED_MARGIN))
+
+        n_new = len(self.surrogate) - self.surrogate.n_fitted
+        if (len(self.surrogate) >= self.surrogate_config.get("min_samples", 64)
+                and n_new >= self.surrogate_config.get("refit_every", 32)):
+            self.surrogate.fit()
+
+    def _compute_margin(self, evaluation):
+        panels, stiffeners, margins = self.rules.min_margin(evaluation, mode="stiff")
+        index = pd.MultiIndex.from_arrays([panels, stiffeners], names=["panel", "stiffener"])
+        return pd.Series(margins, index=index, name="margin")
+
+    def _get_observation(self, margin):
+        if not margin.index.equals(self.margin_index):
+            margin = margin.reindex(self.margin_index)
+        return self.observer.build(self.specs, margin.to_numpy(dtype=np.float64))
 
     def _find_group(self, panel, stiff):
-        row = self.df_stiff_new[
-            (self.df_stiff_new["Ipan"] == str(panel)) &
-            (self.df_stiff_new["stiff_index"] == int(stiff))
-        ]
-        return row["group"].iloc[0]
+        return self.group_of[(int(panel), int(stiff))]
 
-    def _compute_weight(self, df):
-        cols = [4, 5, 6, 7]
-        vals = df.iloc[:, cols].apply(pd.to_numeric, errors="coerce")
-        return vals.sum(axis=1).sum()
+    def _compute_weight(self):
+        return self.weights.total
 
     def _compute_reward(self, margins, group):
         curr_fail = (margins < 0).sum()
         fail_change = self.prev_fail - curr_fail
         reward = 0
 
-        current_w = self._compute_weight(self.df_stiff_new)
+        current_w = self._compute_weight()
         delta_w = self.prev_weight - current_w
         w_ratio = delta_w / self.prev_weight
 
@@ -179,4 +550,5 @@ class ScantlingOptEnv(gym.Env):
         return reward, terminated
 
     def render(self):
-        print(f"[Step {self.current_step}] Weight={self._compute_weight(self.df_stiff_new):.2f}")
\ No newline at end of file
+        print(f"[Step {self.current_step}] Weight={self._compute_weight():.2f}")
+        print(self.weights.by_panel().to_string())
\ No newline at end of file
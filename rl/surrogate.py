@@ -0,0 +1,56 @@
+import numpy as np
+
+
+class MarginSurrogate:
+    # 부트스트랩 리지 회귀 앙상블. 앙상블 예측의 표준편차를 불확실도로 쓴다.
+    def __init__(self, n_models=5, l2=1.0, seed=0):
+        self.n_models = n_models
+        self.l2 = l2
+        self.rng = np.random.default_rng(seed)
+        self.X = []
+        self.Y = []
+        self.models = []
+        self.n_fitted = 0
+
+    def __len__(self):
+        return len(self.X)
+
+    @property
+    def fitted(self):
+        return bool(self.models)
+
+    def add(self, x, y):
+        self.X.append(np.asarray(x, dtype=np.float64))
+        self.Y.append(np.asarray(y, dtype=np.float64))
+
+    @staticmethod
+    def _features(X):
+        return np.hstack([X, X ** 2])
+
+    def _standardize(self, X):
+        return (self._features(X) - self.mu) / self.sigma
+
+    def fit(self):
+        X = self._features(np.stack(self.X))
+        Y = np.stack(self.Y)
+
+        self.mu = X.mean(axis=0)
+        self.sigma = X.std(axis=0)
+        self.sigma[self.sigma == 0] = 1.0
+        Z = (X - self.mu) / self.sigma
+        eye = self.l2 * np.eye(Z.shape[1])
+
+        self.models = []
+        for _ in range(self.n_models):
+            idx = self.rng.integers(0, len(Z), len(Z))
+            Zb, Yb = Z[idx], Y[idx]
+            bias = Yb.mean(axis=0)
+            weight = np.linalg.solve(Zb.T @ Zb + eye, Zb.T @ (Yb - bias))
+            self.models.append((weight, bias))
+
+        self.n_fitted = len(self.X)
+
+    def predict(self, x):
+        z = self._standardize(np.asarray(x, dtype=np.float64)[None, :])
+        preds = np.stack([(z @ weight + bias)[0] for weight, bias in self.models])
+        return preds.mean(axis=0), preds.std(axis=0)
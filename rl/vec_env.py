@@ -0,0 +1,84 @@
+from concurrent.futures import as_completed
+
+import numpy as np
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from utils.async_solver import MarsPipeline
+from utils.solver import SolverError
+
+
+class PipelinedVecEnv(VecEnv):
+    # 모든 환경을 한 프로세스에 두고 MARS 실행만 비동기로 돌린다.
+    # 한 작업자의 MARS 가 도는 동안 먼저 끝난 작업자의 결과를 파싱/평가하므로
+    # solver 와 Python 처리가 번갈아 멈추지 않고 겹쳐서 진행된다.
+    def __init__(self, env_fns):
+        self.envs = [fn() for fn in env_fns]
+        env = self.envs[0]
+        super().__init__(len(self.envs), env.observation_space, env.action_space)
+        self.pipeline = MarsPipeline()
+        self._ready = []
+        self._futures = {}
+
+    def reset(self):
+        obs = []
+        for idx, env in enumerate(self.envs):
+            o, self.reset_infos[idx] = env.reset(seed=self._seeds[idx], **self._options[idx])
+            obs.append(o)
+        self._reset_seeds()
+        self._reset_options()
+        return np.stack(obs)
+
+    def step_async(self, actions):
+        self._ready = []
+        self._futures = {}
+        for idx, (env, action) in enumerate(zip(self.envs, actions)):
+            if env.prepare_step(action):
+                self._futures[self.pipeline.submit(env.config, solver=env.solver)] = idx
+            else:
+                self._ready.append(idx)
+
+    def step_wait(self):
+        results = [None] * self.num_envs
+
+        for idx in self._ready:
+            results[idx] = self.envs[idx].complete_step()
+        for future in as_completed(self._futures):
+            idx = self._futures[future]
+            try:
+                result, timings = future.result()
+            except SolverError as error:
+                results[idx] = self.envs[idx].fail_step(error)
+                continue
+            results[idx] = self.envs[idx].complete_step(result, timings)
+
+        obs, rewards, dones, infos = [], [], [], []
+        for idx, (o, reward, terminated, truncated, info) in enumerate(results):
+            done = terminated or truncated
+            info["TimeLimit.truncated"] = truncated and not terminated
+            if done:
+                info["terminal_observation"] = o
+                o, self.reset_infos[idx] = self.envs[idx].reset()
+            obs.append(o)
+            rewards.append(reward)
+            dones.append(done)
+            infos.append(info)
+
+        return np.stack(obs), np.array(rewards, dtype=np.float32), np.array(dones), infos
+
+    def close(self):
+        self.pipeline.close()
+        for env in self.envs:
+            env.close()
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.envs[i], attr_name) for i in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        for i in self._get_indices(indices):
+            setattr(self.envs[i], attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [getattr(self.envs[i], method_name)(*method_args, **method_kwargs) for i in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -1,39 +1,147 @@
 import os
-
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv
-from stable_baselines3 import SAC
-from stable_baselines3.common.callbacks import EvalCallback, CheckpointCallback
-from stable_baselines3.common.monitor import Monitor
+import json
 
 from rl.rl_env import ScantlingOptEnv
+from utils.timing import episode_info_keywords
+from utils.cache import file_digest
+from utils.experience import ExperienceStore, discounted_returns
+
+
+def make_env(config_path, rank, max_steps=20, monitor=True):
+    def _init():
+        env = ScantlingOptEnv(config_path=config_path, max_steps=max_steps, rank=rank)
+        if monitor:
+            from stable_baselines3.common.monitor import Monitor
+            env = Monitor(env, info_keywords=episode_info_keywords())
+        return env
+    return _init
+
+
+def pretrain_from_experience(model, config):
+    # 저장해 둔 평가 기록으로 정책/가치 네트워크를 미리 학습한다.
+    # 가치는 에피소드별 할인 누적 보상에 맞추고, 정책은 누적 보상이 높은 행동에 가중치를 둔 behavior cloning.
+    import numpy as np
+    import torch
+    import torch.nn.functional as F
+
+    experience_config = config.get("experience") or {}
+    epochs = experience_config.get("pretrain_epochs", 0)
+    if not experience_config.get("dir") or epochs <= 0:
+        return model
+
+    store = ExperienceStore(experience_config["dir"], salt=file_digest(config["temp_path"]))
+    data = store.load()
+    if data is None:
+        print("[WARN] 사전학습에 쓸 기록이 없음:", experience_config["dir"])
+        return model
+    if data["obs"].shape[1:] != model.observation_space.shape:
+        print("[WARN] 기록의 관측 크기가 현재 환경과 다름:", data["obs"].shape[1:])
+        return model
+
+    returns = discounted_returns(data["reward"], data["done"], data["session"], model.gamma)
+    advantages = (returns - returns.mean()) / (returns.std() + 1e-8)
+    weights = np.minimum(np.exp(advantages / experience_config.get("pretrain_beta", 1.0)), 20.0)
+
+    policy = model.policy
+    device = policy.device
+    obs = torch.as_tensor(data["obs"], dtype=torch.float32, device=device)
+    actions = torch.as_tensor(data["action"], dtype=torch.long, device=device)
+    returns = torch.as_tensor(returns, dtype=torch.float32, device=device)
+    weights = torch.as_tensor(weights, dtype=torch.float32, device=device)
+
+    n = len(obs)
+    batch_size = experience_config.get("pretrain_batch_size", 256)
+    print(f"Pretrain on {n} records")
+    policy.set_training_mode(True)
+    for epoch in range(epochs):
+        order = torch.randperm(n, device=device)
+        policy_losses, value_losses = [], []
+        for start in range(0, n, batch_size):
+            idx = order[start:start + batch_size]
+            values, log_prob, _ = policy.evaluate_actions(obs[idx], actions[idx])
+            value_loss = F.mse_loss(values.flatten(), returns[idx])
+            policy_loss = -(weights[idx] * log_prob).mean()
+            loss = policy_loss + model.vf_coef * value_loss
 
+            policy.optimizer.zero_grad()
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(policy.parameters(), model.max_grad_norm)
+            policy.optimizer.step()
+            policy_losses.append(policy_loss.item())
+            value_losses.append(value_loss.item())
+        print(f"[pretrain {epoch + 1}/{epochs}] policy_loss: {np.mean(policy_losses):.4f}, value_loss: {np.mean(value_losses):.4f}")
+    policy.set_training_mode(False)
+    return model
+
+
+def train_scantling_env(config_path, n_envs=None):
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    if n_envs is None:
+        n_envs = config.get("n_envs", 1)
+
+    # stable_baselines3/torch 는 가져오는 데만 몇 초 걸리므로 학습할 때만 import 한다.
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecMonitor
+    from stable_baselines3.common.callbacks import EvalCallback, CheckpointCallback
+    from stable_baselines3.common.monitor import Monitor
+    from rl.vec_env import PipelinedVecEnv
+    from rl.callbacks import AsyncEvalCallback
+
+    if n_envs > 1 and config.get("pipelined", False):
+        # 한 프로세스에서 작업자별 MARS 를 비동기로 돌리고 결과 처리를 겹친다.
+        env = PipelinedVecEnv([make_env(config_path, rank, monitor=False) for rank in range(n_envs)])
+        env = VecMonitor(env, info_keywords=episode_info_keywords())
+    elif n_envs > 1:
+        # 작업자마다 별도의 MARS 작업 폴더를 쓰므로 서로 입력/결과 파일을 덮어쓰지 않는다.
+        env = SubprocVecEnv([make_env(config_path, rank) for rank in range(n_envs)])
+    else:
+        env = ScantlingOptEnv(config_path=config_path, max_steps=20)
+        env = Monitor(env, info_keywords=episode_info_keywords())
 
-def train_scantling_env(config_path):
-    env = ScantlingOptEnv(config_path=config_path, max_steps=20)
-    env = Monitor(env)
+    algo, eval_callback_cls = PPO, EvalCallback
+    if config.get("action_masking", False):
+        # T-bar 가 없는 그룹을 고르지 않도록 env.action_masks() 를 쓰는 MaskablePPO (sb3-contrib 필요)
+        from sb3_contrib import MaskablePPO
+        from sb3_contrib.common.maskable.callbacks import MaskableEvalCallback
+        algo, eval_callback_cls = MaskablePPO, MaskableEvalCallback
 
     if os.path.exists("./logs/best_model/best_model.zip"):
         print("Load model")
-        model = PPO.load("./logs/best_model/best_model.zip", device="cuda")
+        model = algo.load("./logs/best_model/best_model.zip", device="cuda")
         model.set_env(env)
     else:
         print("New model")
-        model = PPO(
+        model = algo(
             "MlpPolicy",
             env,
             device="cuda",
             verbose=1,
         )
+        pretrain_from_experience(model, config)
 
-    eval_callback = EvalCallback(
-        env,
-        best_model_save_path="./logs/best_model/",
-        log_path="./logs/eval/",
-        eval_freq=20,
-        deterministic=True,
-        render=False,
-    )
+    # 평가 환경은 학습 작업자 다음 번호(rank=n_envs)의 작업 폴더를 쓴다.
+    eval_rank = max(n_envs, 1)
+    if config.get("async_eval", True):
+        # 정책 스냅샷을 별도 프로세스에서 평가하므로 평가 중에도 학습이 멈추지 않는다.
+        eval_callback = AsyncEvalCallback(
+            config_path,
+            rank=eval_rank,
+            eval_freq=20,
+            best_model_save_path="./logs/best_model/",
+            log_path="./logs/eval/",
+            deterministic=True,
+            use_masks=config.get("action_masking", False),
+        )
+    else:
+        eval_callback = eval_callback_cls(
+            DummyVecEnv([make_env(config_path, eval_rank)]),
+            best_model_save_path="./logs/best_model/",
+            log_path="./logs/eval/",
+            eval_freq=20,
+            deterministic=True,
+            render=False,
+        )
 
     checkpoint_callback = CheckpointCallback(
         save_freq=20,
@@ -53,4 +161,4 @@ def train_scantling_env(config_path):
 
 
 if __name__ == "__main__":
-    train_scantling_env('data/config.json')
\ No newline at end of file
+    train_scantling_env('data/config.json')
@@ -0,0 +1,45 @@
+import time
+import asyncio
+import threading
+
+from utils.mars import parse_output_arrays
+from utils.solver import get_solver
+
+
+async def run_solver_async(config, solver=None):
+    # 시간 제한과 재시도는 SolverWatchdog 이 맡으므로 작업자 스레드에서 그대로 실행한다.
+    # MARS 는 batch 파일과 "start /wait" 를 거치지 않고 실행 파일을 직접 띄운다.
+    solver = solver or get_solver(config, direct=True)
+    return await asyncio.to_thread(solver.run, config)
+
+
+async def run_mars_async(config, sections=("stiffener",), solver=None):
+    # solver 가 끝내 실패하면 SolverError 가 Future 로 전달된다.
+    timings = {}
+
+    start = time.perf_counter()
+    await run_solver_async(config, solver)
+    timings["solver"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = await asyncio.to_thread(parse_output_arrays, config["output_path"], sections)
+    timings["parse"] = time.perf_counter() - start
+    return result, timings
+
+
+class MarsPipeline:
+    # 별도 스레드에서 이벤트 루프를 돌리며 작업자별 MARS 실행과 결과 파싱을 겹쳐 처리한다.
+    # submit() 은 concurrent.futures.Future 를 돌려주므로 동기 코드에서 바로 쓸 수 있다.
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def submit(self, config, sections=("stiffener",), solver=None):
+        return asyncio.run_coroutine_threadsafe(run_mars_async(config, sections, solver), self.loop)
+
+    def close(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+        self.loop.close()
@@ -0,0 +1,63 @@
+import os
+
+from utils.cache import file_digest, solver_salt, stiff_scant_key, pack_result, unpack_result
+from utils.mars import parse_output_arrays
+from utils.parser import update_stiff_scant_in_ma2
+from utils.solver import get_solver
+from utils.workspace import result_name
+
+
+def candidate_configs(config, n_candidates):
+    input_dir = os.path.dirname(config["input_path"])
+    output_dir = os.path.dirname(config["output_path"])
+    stem = os.path.splitext(os.path.basename(config["input_path"]))[0]
+
+    configs = []
+    for k in range(n_candidates):
+        input_path = os.path.join(input_dir, f"{stem}_c{k}.ma2")
+        candidate = dict(config)
+        candidate["input_path"] = input_path
+        candidate["output_path"] = os.path.join(output_dir, result_name(config, input_path))
+        configs.append(candidate)
+    return configs
+
+
+def evaluate_candidates(config, tables, sections=("stiffener",), cache=None, solver=None, salt=None):
+    # tables: .ma2 의 STIFF SCANT 에 쓸 후보 테이블 목록 (update_stiff_scant_in_ma2 입력과 같은 형태)
+    # solver 는 호출한 쪽이 계속 들고 있어야 실패/격리 횟수가 이어진다. 캐시 키는 Ma2Template.key 와 같다.
+    results = [None] * len(tables)
+    keys = [None] * len(tables)
+
+    if cache is not None:
+        if salt is None:
+            salt = solver_salt(config, file_digest(config["temp_path"]))
+        for k, table in enumerate(tables):
+            keys[k] = stiff_scant_key(table, salt=salt)
+            arrays = cache.get(keys[k])
+            if arrays is not None:
+                results[k] = unpack_result(arrays, sections)
+
+    pending = [k for k, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    configs = candidate_configs(config, len(pending))
+    for candidate, k in zip(configs, pending):
+        update_stiff_scant_in_ma2(config["temp_path"], candidate["input_path"], tables[k])
+        if os.path.exists(candidate["output_path"]):
+            os.remove(candidate["output_path"])
+
+    batch_path = os.path.join(os.path.dirname(config["batch_path"]), "run_candidates.bat")
+    (solver or get_solver(config)).run_many(configs, batch_path)
+
+    for candidate, k in zip(configs, pending):
+        if not os.path.exists(candidate["output_path"]):
+            print("[MARS ERROR] 결과 파일 없음:", candidate["output_path"])
+            results[k] = False
+            continue
+
+        results[k] = parse_output_arrays(candidate["output_path"], sections)
+        if cache is not None:
+            cache.put(keys[k], pack_result(results[k]))
+
+    return results
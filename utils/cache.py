@@ -0,0 +1,134 @@
+import os
+import hashlib
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from utils.fileio import save_npz
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def text_key(text, salt=""):
+    h = hashlib.sha256(salt.encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def solver_salt(config, digest):
+    # 같은 설계라도 solver (local 은 seed 까지) 가 다르면 결과가 다르므로 키를 나눈다.
+    name = config.get("solver", "mars")
+    if name == "local":
+        name = f"{name}|{config.get('solver_seed', 0)}"
+    return text_key(name, salt=digest)
+
+
+def values_key(values, salt=""):
+    # STIFF SCANT 값을 float64 배열로 해시하므로 "16" 과 "16.0" 처럼 표기만 다른 설계도 같은 키가 된다.
+    values = np.asarray(values, dtype=np.float64) + 0.0  # -0.0 -> 0.0
+    values[np.isnan(values)] = np.nan
+    h = hashlib.sha256(salt.encode("utf-8"))
+    h.update(np.asarray(values.shape, dtype=np.int64).tobytes())
+    h.update(np.ascontiguousarray(values).tobytes())
+    return h.hexdigest()
+
+
+def stiff_scant_key(df_scant, salt=""):
+    # Ma2Template.key 와 같은 키 (빈 칸은 nan)
+    return values_key(df_scant.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64), salt)
+
+
+def pack_result(result):
+    arrays = {"items": result["items"]}
+    for section in ("strake", "stiffener"):
+        for column, values in result.get(section, {}).items():
+            arrays[f"{section}.{column}"] = values
+    return arrays
+
+
+def unpack_result(arrays, sections):
+    result = {"items": arrays["items"]}
+    for section in sections:
+        prefix = section + "."
+        columns = {k[len(prefix):]: v for k, v in arrays.items() if k.startswith(prefix)}
+        if not columns:
+            return None
+        result[section] = columns
+    return result
+
+
+class MarsCache:
+    def __init__(self, cache_dir, max_entries=5000):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {k: data[k] for k in data.files}
+            os.utime(path)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return arrays
+
+    def put(self, key, arrays):
+        # 임시 파일에 쓴 뒤 os.replace 로 교체하므로 반쯤 쓰인 파일을 읽는 일은 없다.
+        # Windows 에서는 다른 작업자가 열어 둔 파일을 교체/삭제하면 PermissionError 가 나므로
+        # 캐시는 최선 노력으로만 쓰고, 실패해도 스텝은 계속 진행한다.
+        try:
+            save_npz(self._path(key), **arrays)
+        except OSError as e:
+            print(f"[WARN] 캐시 저장 실패: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        try:
+            scan = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in scan:
+            if not entry.name.endswith(".npz"):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                # 다른 작업자가 지웠거나 읽는 중이면 다음 정리 때 다시 시도한다.
+                pass
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+TBAR_TYPE = 4
+
+# tbar 카탈로그가 없을 때 행동/탐색 공간으로 쓰는 T-bar 치수 목록 (hweb, tweb, hflan, tflan)
+TBAR_OPTIONS = (
+    [350, 375, 400, 425, 450, 475, 500, 525, 550, 575, 600, 625, 650, 675, 700, 725, 750, 775],
+    [11, 11.5, 12, 12.25, 12.5, 13, 13.5, 14, 14.25, 14.5, 15, 15.5, 16],
+    [125, 150, 175, 200],
+    [round(x, 2) for x in np.arange(11.5, 29.5 + 0.001, 0.25)],
+)
+
+
+class ProfileCatalog:
+    # 프로파일 표를 사전순으로 정렬된 float 배열로 들고 있다가 가장 가까운 규격을 찾는다.
+    def __init__(self, name, columns, values):
+        values = np.asarray(values, dtype=np.float64)
+        order = np.lexsort(values.T[::-1])
+        self.name = name
+        self.columns = [str(c).strip() for c in columns]
+        self.values = values[order]
+
+        # 치수마다 단위 범위가 달라서 (높이 수백 mm, 두께 수십 mm) 범위로 나눠 거리를 잰다.
+        span = self.values.max(axis=0) - self.values.min(axis=0)
+        self.scale = np.where(span > 0, span, 1.0)
+
+    @classmethod
+    def from_csv(cls, path, name=None):
+        df = pd.read_csv(path, skipinitialspace=True)
+        if name is None:
+            name = os.path.splitext(os.path.basename(path))[0].lower()
+        return cls(name, df.columns, df.to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self.values)
+
+    def column(self, name):
+        return self.values[:, self.columns.index(name)]
+
+    def nearest(self, specs):
+        specs = np.atleast_2d(np.asarray(specs, dtype=np.float64))
+        diff = (specs[:, None, :] - self.values[None, :, :]) / self.scale
+        return np.argmin(np.einsum("ijk,ijk->ij", diff, diff), axis=1)
+
+    def snap(self, specs):
+        return self.values[self.nearest(specs)]
+
+
+def load_tbar_catalog(config):
+    path = config.get("tbar")
+    if not path or not os.path.exists(path):
+        print(f"[WARN] tbar 카탈로그를 찾을 수 없어 기본 치수 목록을 씁니다: {path}")
+        return None
+    return ProfileCatalog.from_csv(path, "tbar")
+
+
+def action_options(config, catalog):
+    # 기본값은 tbar 카탈로그에 있는 치수값(치수별 오름차순)만 선택지로 쓴다. catalog_options 를 끄면 TBAR_OPTIONS.
+    if catalog is None or not config.get("catalog_options", True):
+        return TBAR_OPTIONS
+    return tuple(np.unique(catalog.values[:, j]).tolist() for j in range(catalog.values.shape[1]))
+
+
+def nearest_option(options, value):
+    options = np.asarray(options, dtype=np.float64)
+    return int(np.argmin(np.abs(options - value)))
+
+
+def group_count(df_stiff_loc):
+    # group_stiff 는 STIFF LOC 한 줄마다 1 부터 그룹 번호를 붙이므로 0 번은 비어 있다.
+    return len(df_stiff_loc) + 1
+
+
+def valid_group_mask(df_stiff, n_groups, stiff_type=TBAR_TYPE):
+    rows = df_stiff["Type"].to_numpy() == stiff_type
+    mask = np.zeros(n_groups, dtype=bool)
+    mask[df_stiff["group"].to_numpy()[rows]] = True
+    return mask
@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+
+# 기준 치수가 그룹 안에서 서로 달라 한 코드로 나타낼 수 없는 그룹은 이 값으로 둔다.
+BASELINE = -1
+
+
+class SpecPalette:
+    # (hweb, tweb, hflan, tflan) 조합마다 정수 코드를 하나씩 붙인다. 한 번 붙인 코드는 바뀌지 않는다.
+    # DesignEvaluator 의 스레드 풀에서 함께 쓰므로 새 코드는 잠금 안에서 붙인다.
+    # 값을 먼저 쓰고 _codes 에 등록하므로 잠금 없이 찾은 코드의 값은 항상 채워져 있다.
+    def __init__(self, width=4):
+        self.values = np.empty((0, width), dtype=np.float64)
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._codes)
+
+    def code(self, spec):
+        key = tuple(float(v) for v in spec)
+        code = self._codes.get(key)
+        if code is not None:
+            return code
+        with self._lock:
+            code = self._codes.get(key)
+            if code is None:
+                code = len(self._codes)
+                if code >= len(self.values):
+                    grown = np.empty((max(16, 2 * len(self.values)), self.values.shape[1]), dtype=np.float64)
+                    grown[:len(self.values)] = self.values
+                    self.values = grown
+                self.values[code] = key
+                self._codes[key] = code
+        return code
+
+    def spec(self, code):
+        return self.values[code]
+
+
+class DesignLayout:
+    # 모든 DesignState 가 함께 쓰는 고정 정보: 그룹 -> 행 인덱스 맵, 기준 치수, 치수 팔레트.
+    def __init__(self, groups, baseline_specs, n_groups=None):
+        self.row_group = np.asarray(groups, dtype=np.int64)
+        self.baseline_specs = np.asarray(baseline_specs, dtype=np.float64).copy()
+        self.baseline_specs.flags.writeable = False
+        if n_groups is None:
+            n_groups = int(self.row_group.max()) + 1 if len(self.row_group) else 0
+        self.n_groups = max(int(n_groups), int(self.row_group.max()) + 1 if len(self.row_group) else 0)
+
+        # 그룹 g 의 행은 order[offsets[g]:offsets[g + 1]]
+        self.order = np.argsort(self.row_group, kind="stable")
+        self.offsets = np.searchsorted(self.row_group[self.order], np.arange(self.n_groups + 1))
+
+        self.palette = SpecPalette(self.baseline_specs.shape[1])
+        self.baseline_codes = np.full(self.n_groups, BASELINE, dtype=np.int32)
+        for group in range(self.n_groups):
+            rows = self.rows(group)
+            if len(rows) and (self.baseline_specs[rows] == self.baseline_specs[rows[0]]).all():
+                self.baseline_codes[group] = self.palette.code(self.baseline_specs[rows[0]])
+
+    def rows(self, group):
+        return self.order[self.offsets[group]:self.offsets[group + 1]]
+
+    def state(self):
+        return DesignState(self)
+
+
+class DesignState:
+    # 설계 상태 = 그룹별 치수 코드 배열. 복사/키/비교/되돌리기는 모두 그룹 수에 비례한다.
+    # 행별 치수 배열이나 DataFrame 은 필요할 때만 specs()/frame() 으로 만든다.
+    __slots__ = ("layout", "codes", "history")
+
+    def __init__(self, layout, codes=None):
+        self.layout = layout
+        self.codes = layout.baseline_codes.copy() if codes is None else codes
+        self.history = []
+
+    def copy(self):
+        return DesignState(self.layout, self.codes.copy())
+
+    def key(self):
+        return self.codes.tobytes()
+
+    def __eq__(self, other):
+        return isinstance(other, DesignState) and np.array_equal(self.codes, other.codes)
+
+    __hash__ = None
+
+    def diff(self, other):
+        # 두 상태에서 코드가 다른 그룹
+        return np.flatnonzero(self.codes != other.codes)
+
+    def set(self, group, spec):
+        # 바뀌었으면 True. 이전 코드는 undo 를 위해 남겨 둔다.
+        code = self.layout.palette.code(spec)
+        previous = int(self.codes[group])
+        if previous == code:
+            return False
+        self.history.append((group, previous))
+        self.codes[group] = code
+        return True
+
+    def undo(self):
+        group, previous = self.history.pop()
+        self.codes[group] = previous
+        return group
+
+    def reset(self):
+        self.codes[:] = self.layout.baseline_codes
+        self.history.clear()
+
+    def group_spec(self, group):
+        code = self.codes[group]
+        return None if code == BASELINE else self.layout.palette.spec(code)
+
+    def changed_groups(self):
+        return np.flatnonzero(self.codes != self.layout.baseline_codes)
+
+    def specs(self, out=None):
+        # 행별 (hweb, tweb, hflan, tflan) 배열
+        if out is None:
+            out = self.layout.baseline_specs.copy()
+        else:
+            out[:] = self.layout.baseline_specs
+        for group in self.changed_groups():
+            out[self.layout.rows(group)] = self.layout.palette.spec(self.codes[group])
+        return out
+
+    def frame(self, df_stiff, spec_columns):
+        # .ma2 에 쓸 때만 기준 DataFrame 에 현재 치수를 채운 사본을 만든다.
+        df = df_stiff.copy()
+        df[list(spec_columns)] = self.specs()
+        return df
@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import zipfile
+
+import numpy as np
+
+from utils.fileio import save_npz
+
+INDEX_NAME = "index.jsonl"
+
+
+def discounted_returns(rewards, dones, sessions, gamma=0.99):
+    # 세션(프로세스) 안에서는 기록 순서가 곧 스텝 순서이므로 뒤에서부터 누적한다.
+    returns = np.zeros(len(rewards), dtype=np.float64)
+    running = 0.0
+    for i in range(len(rewards) - 1, -1, -1):
+        if i == len(rewards) - 1 or dones[i] or sessions[i] != sessions[i + 1]:
+            running = 0.0
+        running = rewards[i] + gamma * running
+        returns[i] = running
+    return returns
+
+
+class ExperienceStore:
+    # 평가한 설계를 열 단위 배열로 모아 chunk_size 개마다 .npz 하나로 저장하고,
+    # index.jsonl 에 청크 파일 이름, 행 수, 기준 설계 해시(salt)를 한 줄씩 남긴다.
+    def __init__(self, store_dir, salt="", chunk_size=256, tag=""):
+        self.store_dir = store_dir
+        self.salt = salt
+        self.chunk_size = chunk_size
+        # 프로세스마다 다른 세션 이름을 써서 여러 작업자가 같은 폴더에 써도 겹치지 않게 한다.
+        self.session = f"{tag}{os.getpid()}_{time.time_ns()}"
+        self.n_chunks = 0
+        self.buffer = {}
+        self.n_buffered = 0
+        os.makedirs(store_dir, exist_ok=True)
+
+    def add(self, **columns):
+        for name, value in columns.items():
+            self.buffer.setdefault(name, []).append(np.asarray(value))
+        self.n_buffered += 1
+        if self.n_buffered >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.n_buffered == 0:
+            return None
+
+        arrays = {name: np.stack(values) for name, values in self.buffer.items()}
+        name = f"{self.session}_{self.n_chunks:06d}.npz"
+        save_npz(os.path.join(self.store_dir, name), **arrays)
+
+        entry = {
+            "file": name,
+            "session": self.session,
+            "chunk": self.n_chunks,
+            "rows": self.n_buffered,
+            "salt": self.salt,
+            "shapes": {k: list(v.shape[1:]) for k, v in arrays.items()},
+        }
+        with open(os.path.join(self.store_dir, INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+        self.n_chunks += 1
+        self.buffer = {}
+        self.n_buffered = 0
+        return name
+
+    def index(self, salt=None):
+        path = os.path.join(self.store_dir, INDEX_NAME)
+        if not os.path.exists(path):
+            return []
+
+        entries = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"[WARN] 손상된 index 줄을 건너뜀: {line[:80]}")
+                    continue
+                if salt is None or entry.get("salt") == salt:
+                    entries.append(entry)
+        entries.sort(key=lambda e: (e["session"], e["chunk"]))
+        return entries
+
+    def __len__(self):
+        return sum(entry["rows"] for entry in self.index(self.salt))
+
+    def load(self, salt=None, columns=None):
+        # 같은 기준 설계(salt)에서 나온 청크만 이어 붙인다. 기본값은 현재 저장소의 salt.
+        salt = self.salt if salt is None else salt
+        chunks = {}
+        sessions = []
+        for entry in self.index(salt):
+            try:
+                with np.load(os.path.join(self.store_dir, entry["file"]), allow_pickle=False) as data:
+                    arrays = {name: data[name] for name in (columns or data.files)}
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                print(f"[WARN] 청크를 읽지 못함: {entry['file']}")
+                continue
+            for name, values in arrays.items():
+                chunks.setdefault(name, []).append(values)
+            sessions.append(np.full(entry["rows"], entry["session"]))
+
+        if not sessions:
+            return None
+
+        result = {name: np.concatenate(values) for name, values in chunks.items()}
+        result["session"] = np.concatenate(sessions)
+        return result
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+import numpy as np
+
+
+def atomic_write(path, write, mode="wb", encoding=None):
+    # 같은 폴더의 임시 파일에 write(f) 로 쓴 뒤 os.replace 로 바꾸므로 반쯤 쓰인 파일을 읽는 일은 없다.
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_npz(path, **arrays):
+    atomic_write(path, lambda f: np.savez_compressed(f, **arrays))
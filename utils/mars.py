@@ -1,10 +1,12 @@
-import os
 import re
 import json
-import subprocess
 
+import numpy as np
 import pandas as pd
 
+from utils.solver import get_solver, SolverError
+from utils.timing import timed
+
 stark_condition_map = {
     "Gross Thick.": "ge",
     "Sig. Nor.": "ge",
@@ -34,155 +36,225 @@ stiff_condition_map = {
 }
 
 
-def run_mars(config):
-    batch_file = config["batch_path"]
-    output_file = config["output_path"]
+KV_PATTERN = re.compile(r'([A-Za-z0-9/ ,\.]+):\s+([-0-9.E\s]+)')
+NUM_PATTERN = re.compile(r'-?\d+\.\d+(?:E[+-]?\d+)?')
+BLOCK_HEADER = re.compile(r'Panel:\s+(\d+)\s+(Strake|Stiffener):\s+(\d+)')
+ITEM_LINE = re.compile(r'(.+?:)\s+([\d.E+-]+)\s+([\d.E+-]+)?(?:\s+(.+))?')
 
-    process = subprocess.run(batch_file, shell=True, capture_output=True, text=True)
+RESULT_SECTIONS = ("global", "strake", "stiffener")
 
-    if process.returncode != 0:
-        print("[MARS ERROR] 실행 실패")
-        print(process.stderr)
-        return False
+CONDITION_SIGN = {"ge": 1.0, "le": -1.0}
+UNCHECKED_MARGIN = 9999
+DEFAULT_EXCLUDED_STIFFENERS = (32, 5, 6, 11, 13)
 
-    if not os.path.exists(output_file):
-        print("[MARS ERROR] 결과 파일 없음:", output_file)
-        return False
 
-    return parse_output_file(output_file)
-
-
-def parse_output_file(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        text = f.read()
+def run_solver(config, solver=None):
+    # 재시도까지 실패하면 SolverError 를 던진다.
+    return (solver or get_solver(config)).run(config)
 
-    kv_pattern = re.compile(r'([A-Za-z0-9/ ,\.]+):\s+([-0-9.E\s]+)')
-    kv_matches = kv_pattern.findall(text)
 
-    rows = []
-    for k, v in kv_matches:
-        nums = re.findall(r'-?\d+\.\d+(?:E[+-]?\d+)?', v)
-        rows.append([k.strip()] + nums)
-
-    max_len = max(len(r) for r in rows)
-    columns = ["Key"] + [f"Value{i}" for i in range(1, max_len)]
-    df_global = pd.DataFrame(rows, columns=columns)
-
-    block_pattern = re.compile(r'(Panel:\s+\d+\s+(?:Strake|Stiffener):\s+\d+)(.*?)(?=Panel:|\Z)', re.S)
-    panel_rows = []
-    stiffener_rows = []
-
-    for header, body in block_pattern.findall(text):
-        panel_num = re.search(r'Panel:\s+(\d+)', header).group(1)
-        is_stiffener = "Stiffener" in header
-
-        if is_stiffener:
-            stiffener_num = re.search(r'Stiffener:\s+(\d+)', header).group(1)
-        else:
-            strake_num = re.search(r'Strake:\s+(\d+)', header).group(1)
+def run_mars(config):
+    try:
+        run_solver(config)
+    except SolverError:
+        return False
+    return parse_output_file(config["output_path"])
+
+
+def run_mars_parsed(config, sections=("stiffener",), timer=None, solver=None):
+    # solver 실행과 결과 파싱. 캐시 조회/저장은 호출한 쪽(env, DesignEvaluator)에서 한다.
+    with timed(timer, "solver"):
+        run_solver(config, solver)
+
+    with timed(timer, "parse"):
+        return parse_output_arrays(config["output_path"], sections)
+
+
+def _to_float(value):
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def parse_output_arrays(path, sections=("stiffener",)):
+    unknown = set(sections) - set(RESULT_SECTIONS)
+    if unknown:
+        raise ValueError(f"unknown result sections: {sorted(unknown)}")
+
+    want_global = "global" in sections
+    columns = {
+        section: ([], [], [], [], [])
+        for section in ("strake", "stiffener") if section in sections
+    }
+    item_codes = {}
+    global_rows = []
+
+    target = None
+    panel_num = block_num = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if want_global:
+                for k, v in KV_PATTERN.findall(line):
+                    global_rows.append([k.strip()] + NUM_PATTERN.findall(v))
+
+            if "Panel:" in line:
+                header = BLOCK_HEADER.search(line)
+                if header:
+                    kind = "stiffener" if header.group(2) == "Stiffener" else "strake"
+                    target = columns.get(kind)
+                    panel_num = int(header.group(1))
+                    block_num = int(header.group(3))
+                    line = line[header.end():]
+                else:
+                    target = None
+
+            if target is None:
+                continue
 
-        for line in body.splitlines():
             line = line.strip()
-            if not line:
-                continue
-            if line.startswith("Actual"):
+            if not line or line.startswith("Actual"):
                 continue
 
-            match = re.match(r'(.+?:)\s+([\d.E+-]+)\s+([\d.E+-]+)?(?:\s+(.+))?', line)
+            match = ITEM_LINE.match(line)
             if not match:
                 continue
 
-            item = match.group(1).strip()
-            actual = match.group(2)
-            rule = match.group(3)
+            item = match.group(1).strip().replace(":", "")
+            code = item_codes.setdefault(item, len(item_codes))
+
+            panels, numbers, items, actuals, rules = target
+            panels.append(panel_num)
+            numbers.append(block_num)
+            items.append(code)
+            actuals.append(_to_float(match.group(2)))
+            rules.append(_to_float(match.group(3)))
+
+    result = {"items": np.array(list(item_codes), dtype=str)}
+    for section, (panels, numbers, items, actuals, rules) in columns.items():
+        result[section] = {
+            "panel": np.array(panels, dtype=np.int32),
+            section: np.array(numbers, dtype=np.int32),
+            "item": np.array(items, dtype=np.int16),
+            "actual": np.array(actuals, dtype=np.float64),
+            "rule": np.array(rules, dtype=np.float64),
+        }
+
+    if want_global:
+        max_len = max((len(r) for r in global_rows), default=1)
+        global_columns = ["Key"] + [f"Value{i}" for i in range(1, max_len)]
+        result["global"] = pd.DataFrame(global_rows, columns=global_columns)
+
+    return result
+
+
+def result_frame(result, section="stiffener"):
+    data = result[section]
+    number_column = "stiffener" if section == "stiffener" else "Strake"
+    return pd.DataFrame({
+        "panel": data["panel"].astype(str),
+        number_column: data[section].astype(str),
+        "item": result["items"][data["item"]],
+        "actual": data["actual"],
+        "rule": data["rule"],
+    })
 
-            if is_stiffener:
-                stiffener_rows.append([panel_num, stiffener_num, item.replace(":", ""), actual, rule])
-            else:
-                panel_rows.append([panel_num, strake_num, item.replace(":", ""), actual, rule])
 
-    df_panel = pd.DataFrame(panel_rows, columns=["panel", "Strake", "item", "actual", "rule"])
-    df_stiffener = pd.DataFrame(stiffener_rows, columns=["panel", "stiffener", "item", "actual", "rule"])
+def parse_output_file(path):
+    result = parse_output_arrays(path, RESULT_SECTIONS)
+    return result["global"], result_frame(result, "strake"), result_frame(result, "stiffener")
 
-    return df_global, df_panel, df_stiffener
 
-
-def evaluate_rule(df, mode="stiff"):
-    if mode == "stiff":
-        condition_map = stiff_condition_map
-    else:
-        condition_map = stark_condition_map
+def evaluate_rule(df, mode="stiff", excluded_stiffeners=DEFAULT_EXCLUDED_STIFFENERS):
+    condition_map = stiff_condition_map if mode == "stiff" else stark_condition_map
 
     df["actual"] = pd.to_numeric(df["actual"], errors="coerce")
     df["rule"]   = pd.to_numeric(df["rule"], errors="coerce")
 
-    results = []
-    for _, row in df.iterrows():
-        item = row["item"].strip().rstrip(":")
-        actual, rule = row["actual"], row["rule"]
-
-        if pd.isna(actual) or pd.isna(rule):
-            results.append(True)
-            continue
-
-        if item not in condition_map:
-            results.append(True)
-            continue
-
-        cond = condition_map[item]
-        if cond == "ge":
-            results.append(actual >= rule)
-        elif cond == "le":
-            results.append(actual <= rule)
-        else:
-            results.append(True)
-
-    df["pass"] = results
-    df = df[~df["stiffener"].isin(["32", "5", "6", "11", "13"])]
-
-    # df.loc[df["stiffener"] == str(32), "pass"] = True
-    # df.loc[df["stiffener"] == str(5), "pass"] = True
-    # df.loc[df["stiffener"] == str(6), "pass"] = True
-    # df.loc[df["stiffener"] == str(11), "pass"] = True
-    # df.loc[df["stiffener"] == str(13), "pass"] = True
+    signs = df["item"].str.strip().str.rstrip(":").map(condition_map).map(CONDITION_SIGN)
+    margin = signs * (df["actual"] - df["rule"])
+    df["pass"] = ~(margin < 0)
+
+    if mode == "stiff":
+        excluded = [str(s) for s in excluded_stiffeners]
+        df = df[~df["stiffener"].astype(str).isin(excluded)]
     return df
 
 
+def row_key(panels, numbers):
+    # (panel, strake/stiffener 번호) 한 쌍을 정렬 가능한 정수 하나로 묶는다.
+    return (np.asarray(panels, dtype=np.int64) << 32) | np.asarray(numbers, dtype=np.int64)
+
+
 def compute_margin(df_eval, mode="stiff"):
-    if mode == "stiff":
-        condition_map = stiff_condition_map
-    else:
-        condition_map = stark_condition_map
+    condition_map = stiff_condition_map if mode == "stiff" else stark_condition_map
 
     df_temp = df_eval.copy()
 
     df_temp["actual"] = pd.to_numeric(df_temp["actual"], errors="coerce")
     df_temp["rule"]   = pd.to_numeric(df_temp["rule"], errors="coerce")
 
-    margins  = []
-    for _, row in df_temp.iterrows():
-        item = row["item"].strip().rstrip(":")
-        actual = row["actual"]
-        rule = row["rule"]
+    signs = df_temp["item"].str.strip().str.rstrip(":").map(condition_map).map(CONDITION_SIGN)
+    df_temp["margin"] = (signs * (df_temp["actual"] - df_temp["rule"])).where(signs.notna(), UNCHECKED_MARGIN)
 
-        cond = condition_map.get(item, None)
+    number_column = "stiffener" if mode == "stiff" else "Strake"
+    stiff_margin = df_temp.groupby(["panel", number_column])["margin"].min()
 
-        if cond is None:
-            margins.append(9999)
-            continue
-
-        if cond == "ge":
-            margin = actual - rule
-        elif cond == "le":
-            margin = rule - actual
-        else:
-            margin = 9999
-        margins.append(margin)
+    return stiff_margin
 
-    df_temp["margin"] = margins
-    stiff_margin = df_temp.groupby(["panel", "stiffener"])["margin"].min()
 
-    return stiff_margin
+class RuleEngine:
+    def __init__(self, excluded_stiffeners=DEFAULT_EXCLUDED_STIFFENERS):
+        self.excluded = np.array(sorted(int(s) for s in excluded_stiffeners), dtype=np.int32)
+        self._compiled = {}
+
+    def _signs(self, items, mode):
+        # 결과 파일마다 item 코드표가 만들어지지만 보통 같은 표가 반복되므로 한 번만 변환한다.
+        key = (mode, tuple(items.tolist()))
+        signs = self._compiled.get(key)
+        if signs is None:
+            condition_map = stiff_condition_map if mode == "stiff" else stark_condition_map
+            signs = np.array(
+                [CONDITION_SIGN.get(condition_map.get(item), 0.0) for item in items.tolist()],
+                dtype=np.float64,
+            )
+            self._compiled[key] = signs
+        return signs
+
+    def evaluate(self, result, mode="stiff"):
+        section = "stiffener" if mode == "stiff" else "strake"
+        data = result[section]
+
+        signs = self._signs(result["items"], mode)[data["item"]]
+        with np.errstate(invalid="ignore"):
+            margin = np.where(signs == 0, UNCHECKED_MARGIN, signs * (data["actual"] - data["rule"]))
+
+        evaluation = dict(data)
+        evaluation["margin"] = margin
+        evaluation["pass"] = ~(margin < 0)
+
+        if mode == "stiff" and len(self.excluded):
+            keep = ~np.isin(data["stiffener"], self.excluded)
+            evaluation = {k: v[keep] for k, v in evaluation.items()}
+        return evaluation
+
+    def min_margin(self, evaluation, mode="stiff"):
+        section = "stiffener" if mode == "stiff" else "strake"
+        panels = evaluation["panel"]
+        numbers = evaluation[section]
+        if len(panels) == 0:
+            return panels, numbers, evaluation["margin"]
+
+        key = row_key(panels, numbers)
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        margins = np.fmin.reduceat(evaluation["margin"][order], starts)
+
+        first = order[starts]
+        return panels[first], numbers[first], margins
 
 
 if __name__ == "__main__":
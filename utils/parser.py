@@ -1,7 +1,12 @@
 import re
+import mmap
+import numpy as np
 import pandas as pd
 from collections import defaultdict
 
+from utils.cache import values_key
+from utils.fileio import atomic_write
+
 
 def parse_ma2_sections(file_path: str):
     sections = defaultdict(list)
@@ -18,14 +23,14 @@ def parse_ma2_sections(file_path: str):
     return {k: "\n".join(v).strip() for k, v in sections.items()}
 
 
-def parse_table(section_text: str) -> pd.DataFrame:
+def split_table(section_text: str):
     lines = [l for l in section_text.splitlines() if l.strip()]
     if not lines:
-        return pd.DataFrame()
+        return None, []
 
     header_candidates = [l for l in lines if l.startswith("*")]
     if not header_candidates:
-        return pd.DataFrame()
+        return None, []
 
     header_line = None
     for cand in header_candidates:
@@ -49,9 +54,55 @@ def parse_table(section_text: str) -> pd.DataFrame:
             row = row[:len(header)]
         rows.append(row)
 
+    return header, rows
+
+
+def parse_table(section_text: str) -> pd.DataFrame:
+    header, rows = split_table(section_text)
+    if header is None:
+        return pd.DataFrame()
     return pd.DataFrame(rows, columns=header)
 
 
+def infer_column(values):
+    try:
+        return np.array([int(v) for v in values], dtype=np.int64)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    except ValueError:
+        return np.array(values, dtype=object)
+
+
+class Ma2Table:
+    # 숫자 열은 한 번만 변환해 NumPy 배열로 들고 있고, 파일에 다시 쓸 때는
+    # 원래 문자열(tokens)을 그대로 쓰므로 "16" 이 "16.0" 으로 바뀌지 않는다.
+    def __init__(self, columns, tokens):
+        self.columns = list(columns)
+        self.tokens = tokens
+        self.data = [infer_column([row[i] for row in tokens]) for i in range(len(self.columns))]
+        self._frame = None
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def column(self, name):
+        return self.data[self.columns.index(name)]
+
+    def to_frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            df = pd.DataFrame({i: arr for i, arr in enumerate(self.data)}, index=range(len(self.tokens)))
+            df.columns = self.columns
+            self._frame = df
+        return self._frame.copy()
+
+
+def parse_typed_table(section_text: str) -> Ma2Table:
+    header, rows = split_table(section_text)
+    return Ma2Table(header or [], rows)
+
+
 def parse_key_values(section_text: str) -> dict:
     lines = [l.strip() for l in section_text.splitlines() if l.strip()]
     result = {}
@@ -171,11 +222,11 @@ SECTION_PARSERS = {
     "version": parse_version,
     "bsd": parse_bsd,
     "main": parse_main,
-    "panels": parse_table,
-    "nodes": parse_table,
-    "strakes": parse_table,
-    "stiff loc": parse_table,
-    "stiff scant": parse_table,
+    "panels": parse_typed_table,
+    "nodes": parse_typed_table,
+    "strakes": parse_typed_table,
+    "stiff loc": parse_typed_table,
+    "stiff scant": parse_typed_table,
     "stiff scant bis": parse_table,
     "special span": parse_table,
     "deck load": parse_table,
@@ -216,11 +267,15 @@ def build_stiffener_groups(panels_df: pd.DataFrame, stiff_loc_df: pd.DataFrame,
 
 def parse_ma2(file_path: str) -> dict:
     sections = parse_ma2_sections(file_path)
-    parsed = {}
+    parsed = {"tables": {}}
 
     for sec_name, content in sections.items():
         func = SECTION_PARSERS.get(sec_name, parse_key_values)
-        parsed[sec_name] = func(content)
+        result = func(content)
+        if isinstance(result, Ma2Table):
+            parsed["tables"][sec_name] = result
+            result = result.to_frame()
+        parsed[sec_name] = result
 
     if "panels" in parsed and "stiff loc" in parsed and "stiff scant" in parsed:
         panel_df = parsed["panels"] if isinstance(parsed["panels"], pd.DataFrame) else pd.DataFrame()
@@ -231,27 +286,146 @@ def parse_ma2(file_path: str) -> dict:
     return parsed
 
 
+SECTION_HEADER = re.compile(rb"^-+[ \t]*(\w[\w \t]*?)[ \t]*-+[ \t]*\r?$", re.M)
+
+
+class Ma2Index:
+    # 파일을 mmap 으로 열어 섹션 머리줄 위치만 한 번 훑어 두고,
+    # 각 섹션은 처음 요청될 때 파싱해서 캐시한다. (env 는 STIFF SCANT / STIFF LOC 만 읽는다)
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 빈 파일은 mmap 할 수 없다.
+            self.data = b""
+
+        self.spans = defaultdict(list)
+        headers = list(SECTION_HEADER.finditer(self.data))
+        for i, match in enumerate(headers):
+            name = match.group(1).decode("utf-8", errors="ignore").strip().lower()
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(self.data)
+            self.spans[name].append((match.end(), end))
+
+        self._tables = {}
+        self._parsed = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def __contains__(self, name):
+        return name in self.spans
+
+    def names(self):
+        return list(self.spans)
+
+    def text(self, name: str) -> str:
+        if name not in self.spans:
+            raise KeyError(name)
+        chunks = [self.data[start:end] for start, end in self.spans[name]]
+        text = b"\n".join(chunks).replace(b"\r\n", b"\n").decode("utf-8", errors="ignore")
+        return text.strip()
+
+    def table(self, name: str) -> Ma2Table:
+        if name not in self._tables:
+            self._tables[name] = parse_typed_table(self.text(name))
+        return self._tables[name]
+
+    def __getitem__(self, name: str):
+        func = SECTION_PARSERS.get(name, parse_key_values)
+        if func is parse_typed_table:
+            # 표는 Ma2Table 로 캐시하고, 호출한 쪽에서 고쳐 써도 되도록 매번 새 DataFrame 을 돌려준다.
+            return self.table(name).to_frame()
+        if name not in self._parsed:
+            self._parsed[name] = func(self.text(name))
+        return self._parsed[name]
+
+
+SPEC_POSITIONS = [2, 3, 4, 5]  # STIFF SCANT 에서 hweb, tweb, hflan, tflan 열 위치
+STIFF_SCANT_PATTERN = r"(------------------ STIFF SCANT\s+------------------)(.*?)(?=------------------|\Z)"
+
+
+def format_scant_header(columns) -> str:
+    return "* " + "\t".join(columns)
+
+
+def format_value(value):
+    # 빈 칸(None, NaN)은 None, 정수인 실수는 "150.0" 이 아니라 "150" 으로 쓴다. 문자열 토큰은 그대로 둔다.
+    if value is None or isinstance(value, str):
+        return None if value in ("nan", "") else value
+    if pd.isna(value):
+        return None
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def format_scant_row(values) -> str:
+    values = [v for v in map(format_value, values) if v is not None]
+    formatted = " " + " \t ".join(values) + "  "
+    return formatted.replace(" -", "-")
+
+
+def _token_value(token):
+    try:
+        return float(token)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _same_value(token, value):
+    if token is None:
+        return format_value(value) is None
+    try:
+        return float(token) == float(value)
+    except (TypeError, ValueError):
+        return token == value
+
+
+def merge_tokens(tokens, values):
+    # 값이 바뀌지 않은 칸은 원래 토큰("16.0" 등)을 그대로 쓴다.
+    return [
+        token if _same_value(token, value) else value
+        for token, value in zip(tokens + [None] * (len(values) - len(tokens)), values)
+    ]
+
+
+def format_stiff_scant(new_df: pd.DataFrame, tokens=None) -> str:
+    header_line = format_scant_header(new_df.columns)
+    body_lines = []
+
+    # itertuples 는 iterrows 와 달리 행마다 dtype 을 섞지 않으므로 정수 열이 "1.0" 으로 쓰이지 않는다.
+    for i, row in enumerate(new_df.itertuples(index=False, name=None)):
+        if tokens is not None and i < len(tokens):
+            row = merge_tokens(tokens[i], list(row))
+        body_lines.append(format_scant_row(row))
+    body_lines.append("*\n")
+
+    return header_line + "\n" + "\n".join(body_lines)
+
+
 def update_stiff_scant_in_ma2(input_ma2: str, output_ma2: str, new_df: pd.DataFrame):
     with open(input_ma2, "r", encoding="utf-8", errors="ignore") as f:
         text = f.read()
 
-    pattern = r"(------------------ STIFF SCANT\s+------------------)(.*?)(?=------------------|\Z)"
-    match = re.search(pattern, text, flags=re.S)
+    match = re.search(STIFF_SCANT_PATTERN, text, flags=re.S)
 
     if not match:
         raise ValueError("STIFF SCANT section not found in file")
 
-    header_line = "* " + "\t".join(new_df.columns)
-    body_lines = []
-
-    for _, row in new_df.iterrows():
-        values = [str(v) for v in row.values if v not in ["nan", None, ""]]
-        formatted = " " + " \t ".join(values) + "  "
-        formatted = formatted.replace(" -", "-")
-        body_lines.append(formatted)
-    body_lines.append("*\n")
-
-    new_section = match.group(1) + "\n" + header_line + "\n" + "\n".join(body_lines)
+    header, tokens = split_table(match.group(2))
+    if header != [str(c) for c in new_df.columns]:
+        tokens = None
+    new_section = match.group(1) + "\n" + format_stiff_scant(new_df, tokens)
 
     new_text = text[:match.start()] + new_section + text[match.end():]
 
@@ -259,6 +433,71 @@ def update_stiff_scant_in_ma2(input_ma2: str, output_ma2: str, new_df: pd.DataFr
         f.write(new_text)
 
 
+class Ma2Template:
+    # update_stiff_scant_in_ma2 와 같은 결과를 쓰되, 파일은 한 번만 읽고
+    # 값이 바뀐 행만 다시 문자열로 만든다.
+    def __init__(self, file_path: str, table: Ma2Table, n_rows: int = None):
+        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+
+        match = re.search(STIFF_SCANT_PATTERN, text, flags=re.S)
+        if not match:
+            raise ValueError("STIFF SCANT section not found in file")
+
+        if n_rows is None:
+            n_rows = len(table)
+
+        self.prefix = text[:match.start()] + match.group(1) + "\n"
+        self.suffix = text[match.end():]
+        self.header_line = format_scant_header(table.columns)
+        self.baseline_tokens = [list(row) for row in table.tokens[:n_rows]]
+        self.baseline_rows = [format_scant_row(row) for row in self.baseline_tokens]
+        # 캐시 키용 숫자 값 (빈 칸은 nan). 토큰과 함께 바뀐 칸만 갱신한다.
+        self.baseline_values = np.array(
+            [[_token_value(token) for token in row] for row in self.baseline_tokens], dtype=np.float64
+        ).reshape(len(self.baseline_tokens), len(table.columns))
+        self.reset()
+
+    def reset(self):
+        self.tokens = [list(row) for row in self.baseline_tokens]
+        self.rows = list(self.baseline_rows)
+        self.values = self.baseline_values.copy()
+
+    def set_values(self, row_indices, column_positions, values):
+        # 기준 설계와 같은 값이면 원래 토큰을 쓰므로 update_stiff_scant_in_ma2 와 같은 텍스트가 된다.
+        formatted = [format_value(v) for v in values]
+        for idx in row_indices:
+            row = self.tokens[idx]
+            baseline = self.baseline_tokens[idx]
+            for pos, value, text in zip(column_positions, values, formatted):
+                row[pos] = baseline[pos] if _same_value(baseline[pos], value) else text
+            self.rows[idx] = format_scant_row(row)
+        self.values[np.ix_(np.asarray(row_indices), column_positions)] = [_token_value(v) for v in formatted]
+
+    def snapshot(self, row_indices):
+        return [(idx, list(self.tokens[idx]), self.rows[idx], self.values[idx].copy()) for idx in row_indices]
+
+    def restore(self, snapshot):
+        for idx, tokens, row, values in snapshot:
+            self.tokens[idx] = list(tokens)
+            self.rows[idx] = row
+            self.values[idx] = values
+
+    def key(self, salt=""):
+        # stiff_scant_key 와 같은 키. 표기("16" / "16.0")가 달라도 값이 같으면 같은 키가 된다.
+        return values_key(self.values, salt)
+
+    def section(self) -> str:
+        return self.header_line + "\n" + "\n".join(self.rows + ["*\n"])
+
+    def render(self) -> str:
+        return self.prefix + self.section() + self.suffix
+
+    def write(self, output_ma2: str):
+        text = self.render()
+        atomic_write(output_ma2, lambda f: f.write(text), mode="w", encoding="utf-8")
+
+
 if __name__ == "__main__":
     parsed = parse_ma2("../data/sample.ma2")
 
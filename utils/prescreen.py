@@ -0,0 +1,84 @@
+import numpy as np
+
+from utils.mars import row_key
+from utils.solver import tbar_section
+
+# 단면 치수만으로 근사할 수 있는 항목과 section_properties() 의 열 위치
+SCREEN_ITEMS = {"Net Load W.": 0, "Net Load Ash.": 1}
+
+CERTAIN_FAIL = "fail"
+CERTAIN_PASS = "pass"
+UNCERTAIN = "uncertain"
+
+
+def section_properties(specs, plate_breadth=800.0, plate_thick=14.0, corrosion=1.0):
+    # specs: (n, 4) [hweb, tweb, hflan, tflan] -> (n, 2) [순 단면계수 cm3, 순 전단면적 cm2]
+    hweb, tweb, hflan, tflan = np.atleast_2d(np.asarray(specs, dtype=np.float64)).T
+    modulus, shear_area = tbar_section(
+        hweb, tweb - corrosion, hflan, tflan - corrosion, plate_breadth, plate_thick - corrosion,
+    )
+    return np.stack([modulus, shear_area], axis=1)
+
+
+class SectionPrescreen:
+    # 마지막 MARS 결과의 actual / 근사값 비율로 stiffener 마다 근사식을 보정해 두고,
+    # 그룹 치수를 바꿨을 때 Net Load W./Ash. 가 규칙값을 확실히 밑도는지 MARS 없이 판단한다.
+    # 규칙값(rule)은 하중과 스팬으로 정해지므로 치수가 바뀌어도 마지막 값을 그대로 쓴다.
+    def __init__(self, panels, stiffeners, tolerance=0.1, plate_breadth=800.0, plate_thick=14.0, corrosion=1.0):
+        self.tolerance = tolerance
+        self.plate = (plate_breadth, plate_thick, corrosion)
+
+        keys = row_key(panels, stiffeners)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+        n = len(keys)
+        self.ratio = np.full((n, len(SCREEN_ITEMS)), np.nan)
+        self.rule = np.full((n, len(SCREEN_ITEMS)), np.nan)
+        self.other = np.full(n, np.nan)
+        self.calibrated = False
+
+    def _rows(self, panels, stiffeners):
+        keys = row_key(panels, stiffeners)
+        pos = np.clip(np.searchsorted(self.sorted_keys, keys), 0, len(self.sorted_keys) - 1)
+        found = self.sorted_keys[pos] == keys
+        return np.where(found, self.order[pos], -1)
+
+    def calibrate(self, specs, items, evaluation):
+        rows = self._rows(evaluation["panel"], evaluation["stiffener"])
+        slots = np.array([SCREEN_ITEMS.get(item, -1) for item in items.tolist()], dtype=np.int64)[evaluation["item"]]
+        known = rows >= 0
+
+        estimate = section_properties(specs, *self.plate)
+        self.ratio.fill(np.nan)
+        self.rule.fill(np.nan)
+        self.other.fill(np.nan)
+
+        screened = known & (slots >= 0)
+        r, s = rows[screened], slots[screened]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.ratio[r, s] = evaluation["actual"][screened] / estimate[r, s]
+        self.rule[r, s] = evaluation["rule"][screened]
+
+        # 근사하지 않는 항목은 치수가 바뀌어도 마지막 margin 이 유지된다고 본다.
+        rest = known & (slots < 0)
+        np.fmin.at(self.other, rows[rest], evaluation["margin"][rest])
+        self.calibrated = True
+
+    def classify(self, rows, specs):
+        if not self.calibrated or len(rows) == 0:
+            return UNCERTAIN, np.full(len(rows), np.nan)
+
+        estimate = section_properties(specs, *self.plate) * self.ratio[rows]
+        rule = self.rule[rows]
+        known = np.isfinite(estimate) & np.isfinite(rule) & (rule > 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            relative = estimate / rule
+            margins = np.fmin(self.other[rows], np.fmin.reduce(np.where(known, estimate - rule, np.nan), axis=1))
+
+        if (known & (relative < 1 - self.tolerance)).any():
+            return CERTAIN_FAIL, margins
+        if known.any() and (relative[known] > 1 + self.tolerance).all():
+            return CERTAIN_PASS, margins
+        return UNCERTAIN, margins
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import fnmatch
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils import mars
+from utils.fileio import save_npz
+
+ROW_COLUMNS = {"panel": np.int32, "stiffener": np.int32, "margin": np.float64, "pass": bool, "n_fail": np.int32}
+
+_rules = None
+
+
+def rules_signature(excluded_stiffeners):
+    # 판정 기준(stiff_condition_map, 제외 stiffener)이 바뀌면 저장된 결과를 모두 다시 평가한다.
+    text = json.dumps([sorted(mars.stiff_condition_map.items()), sorted(int(s) for s in excluded_stiffeners)])
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def scan_results(root, pattern="*RULES.txt"):
+    # {경로: (mtime_ns, size)}
+    found = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in fnmatch.filter(filenames, pattern):
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found[os.path.relpath(path, root)] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+def stiffener_table(evaluation):
+    # 항목별 판정 -> stiffener 별 최소 margin (RuleEngine.min_margin), 통과 여부, 실패 항목 수
+    if len(evaluation["panel"]) == 0:
+        return {column: np.empty(0, dtype) for column, dtype in ROW_COLUMNS.items()}
+
+    panels, stiffeners, margins = _rules.min_margin(evaluation, mode="stiff")
+    # min_margin 결과는 키 순서로 정렬되어 있으므로 실패 항목의 위치만 찾아 센다.
+    failed = ~evaluation["pass"]
+    rows = np.searchsorted(mars.row_key(panels, stiffeners),
+                           mars.row_key(evaluation["panel"][failed], evaluation["stiffener"][failed]))
+    return {
+        "panel": panels,
+        "stiffener": stiffeners,
+        "margin": margins,
+        "pass": ~(margins < 0),
+        "n_fail": np.bincount(rows, minlength=len(panels)).astype(np.int32),
+    }
+
+
+def _init_worker(excluded_stiffeners):
+    global _rules
+    _rules = mars.RuleEngine(excluded_stiffeners)
+
+
+def _evaluate_file(path):
+    try:
+        result = mars.parse_output_arrays(path, ("stiffener",))
+        table = stiffener_table(_rules.evaluate(result, mode="stiff"))
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return f"error: {e}", None
+    return "ok", table
+
+
+class ReevaluationTable:
+    # 결과 파일별 stiffener 판정을 모아 하나의 npz (열 단위 배열)로 저장한다.
+    # files.*: 파일마다 한 행, rows.*: stiffener 마다 한 행 (rows.file 은 files 의 위치)
+    def __init__(self, signature):
+        self.signature = signature
+        self.files = {}   # 경로 -> (mtime_ns, size, status)
+        self.tables = {}  # 경로 -> stiffener 표
+
+    @classmethod
+    def load(cls, path, signature):
+        table = cls(signature)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {k: data[k] for k in data.files}
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return table
+        if str(arrays.get("signature")) != signature:
+            print("[WARN] 판정 기준이 바뀌어 모든 결과 파일을 다시 평가합니다.")
+            return table
+
+        file_index = arrays["rows.file"]
+        order = np.argsort(file_index, kind="stable")
+        bounds = np.searchsorted(file_index[order], np.arange(len(arrays["files.path"]) + 1))
+        for i, name in enumerate(arrays["files.path"].tolist()):
+            status = str(arrays["files.status"][i])
+            table.files[name] = (int(arrays["files.mtime_ns"][i]), int(arrays["files.size"][i]), status)
+            if status == "ok":
+                rows = order[bounds[i]:bounds[i + 1]]
+                table.tables[name] = {column: arrays[f"rows.{column}"][rows] for column in ROW_COLUMNS}
+        return table
+
+    def is_current(self, name, stat):
+        # 읽지 못한 파일도 수정되지 않았으면 다시 시도하지 않는다.
+        known = self.files.get(name)
+        return known is not None and known[:2] == stat
+
+    def put(self, name, stat, status, table):
+        self.files[name] = (stat[0], stat[1], status)
+        if table is None:
+            self.tables.pop(name, None)
+        else:
+            self.tables[name] = table
+
+    def retain(self, names):
+        # 더 이상 없는 파일의 결과는 버린다.
+        for name in set(self.files) - set(names):
+            self.files.pop(name)
+            self.tables.pop(name, None)
+
+    def save(self, path):
+        names = sorted(self.files)
+        arrays = {
+            "signature": np.array(self.signature),
+            "files.path": np.array(names, dtype=str),
+            "files.mtime_ns": np.array([self.files[n][0] for n in names], dtype=np.int64),
+            "files.size": np.array([self.files[n][1] for n in names], dtype=np.int64),
+            "files.status": np.array([self.files[n][2] for n in names], dtype=str),
+        }
+        tables = [(i, self.tables[n]) for i, n in enumerate(names) if n in self.tables]
+        arrays["rows.file"] = np.concatenate(
+            [np.full(len(t["panel"]), i, dtype=np.int32) for i, t in tables] or [np.empty(0, np.int32)])
+        for column, dtype in ROW_COLUMNS.items():
+            arrays[f"rows.{column}"] = np.concatenate(
+                [t[column].astype(dtype) for _, t in tables] or [np.empty(0, dtype)])
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        save_npz(path, **arrays)
+
+
+def load_reevaluation(path):
+    # 저장된 표를 stiffener 마다 한 행인 DataFrame 으로 읽는다.
+    with np.load(path, allow_pickle=False) as data:
+        df = pd.DataFrame({column: data[f"rows.{column}"] for column in ROW_COLUMNS})
+        df.insert(0, "path", data["files.path"][data["rows.file"]])
+    return df
+
+
+def reevaluate(root, output_path, excluded_stiffeners=mars.DEFAULT_EXCLUDED_STIFFENERS,
+               pattern="*RULES.txt", n_workers=None, flush_every=500):
+    signature = rules_signature(excluded_stiffeners)
+    table = ReevaluationTable.load(output_path, signature)
+
+    found = scan_results(root, pattern)
+    table.retain(found)
+    todo = sorted(name for name, stat in found.items() if not table.is_current(name, stat))
+    print(f"[reevaluate] {len(found)} files, {len(found) - len(todo)} up to date, {len(todo)} to evaluate")
+
+    n_errors = 0
+    if todo:
+        paths = [os.path.join(root, name) for name in todo]
+        with ProcessPoolExecutor(n_workers, initializer=_init_worker, initargs=(tuple(excluded_stiffeners),)) as pool:
+            # 결과가 나오는 대로 모으고, flush_every 개마다 중간 결과를 저장해 중단되어도 이어서 할 수 있게 한다.
+            results = pool.map(_evaluate_file, paths, chunksize=8)
+            for done, (name, (status, stiffeners)) in enumerate(zip(todo, results), start=1):
+                if status != "ok":
+                    n_errors += 1
+                    print(f"[WARN] {name}: {status}")
+                table.put(name, found[name], status, stiffeners)
+                if done % flush_every == 0:
+                    table.save(output_path)
+                    print(f"[reevaluate] {done}/{len(todo)} evaluated, {n_errors} errors")
+
+    table.save(output_path)
+    print(f"[reevaluate] saved {output_path} ({len(todo) - n_errors} evaluated, {n_errors} errors)")
+    return table
+
+
+def run_reevaluate(config_path, root=None, output_path=None):
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    re_config = config.get("reevaluate") or {}
+    root = root or re_config.get("root") or os.path.dirname(config["output_path"])
+    output_path = output_path or re_config.get("output_path") or os.path.join(root, "reevaluation.npz")
+
+    return reevaluate(
+        root,
+        output_path,
+        excluded_stiffeners=config.get("excluded_stiffeners", mars.DEFAULT_EXCLUDED_STIFFENERS),
+        pattern=re_config.get("pattern", "*RULES.txt"),
+        n_workers=re_config.get("n_workers"),
+        flush_every=re_config.get("flush_every", 500),
+    )
+
+
+if __name__ == "__main__":
+    run_reevaluate(
+        sys.argv[1] if len(sys.argv) > 1 else "data/config.json",
+        sys.argv[2] if len(sys.argv) > 2 else None,
+        sys.argv[3] if len(sys.argv) > 3 else None,
+    )
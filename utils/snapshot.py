@@ -0,0 +1,62 @@
+import os
+import zipfile
+
+import numpy as np
+
+from utils.cache import text_key, solver_salt, pack_result, unpack_result
+from utils.fileio import save_npz
+from utils.parser import Ma2Table
+
+# 저장 형식이 바뀌면 올려서 이전 스냅샷을 무시하게 한다.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_TABLES = ("stiff scant", "stiff loc")
+
+
+def snapshot_key(digest, config):
+    # 같은 .ma2 라도 solver 가 다르면 기준 결과가 다르다. (MarsCache 키와 같은 solver_salt)
+    return text_key(str(SNAPSHOT_VERSION), salt=solver_salt(config, digest))
+
+
+def _table_arrays(name, table):
+    tokens = [["" if token is None else token for token in row] for row in table.tokens]
+    return {
+        f"{name}.columns": np.array(table.columns, dtype=str),
+        f"{name}.tokens": np.array(tokens, dtype=str).reshape(len(tokens), len(table.columns)),
+    }
+
+
+def _table_from_arrays(arrays, name):
+    columns = arrays[f"{name}.columns"].tolist()
+    tokens = [[token or None for token in row] for row in arrays[f"{name}.tokens"].tolist()]
+    return Ma2Table(columns, tokens)
+
+
+def save_snapshot(snapshot_dir, key, tables, result):
+    # tables: {섹션 이름: Ma2Table}, result: 기준 설계의 MARS 결과 (parse_output_arrays 형식)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    arrays = {}
+    for name in SNAPSHOT_TABLES:
+        arrays.update(_table_arrays(name, tables[name]))
+    arrays.update({f"result.{k}": v for k, v in pack_result(result).items()})
+
+    save_npz(os.path.join(snapshot_dir, key + ".npz"), **arrays)
+
+
+def load_snapshot(snapshot_dir, key, sections=("stiffener",)):
+    path = os.path.join(snapshot_dir, key + ".npz")
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {k: data[k] for k in data.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+    try:
+        tables = {name: _table_from_arrays(arrays, name) for name in SNAPSHOT_TABLES}
+    except KeyError:
+        return None
+
+    prefix = "result."
+    result = unpack_result({k[len(prefix):]: v for k, v in arrays.items() if k.startswith(prefix)}, sections)
+    if result is None:
+        return None
+    return tables, result
@@ -0,0 +1,314 @@
+import os
+import time
+import signal
+import subprocess
+
+import numpy as np
+
+from utils.parser import Ma2Index
+from utils.processing import group_stiff
+from utils.workspace import write_batch_file, mars_home
+
+
+class SolverError(RuntimeError):
+    # kind: "exit", "timeout", "missing", "stale", "quarantined"
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def mars_command(config):
+    exe = config.get("mars_exe") or os.path.join(mars_home(config), "marsRule2000.exe")
+    return [exe, "/marsodt", config["input_path"], "1"]
+
+
+def kill_process_tree(process):
+    # batch 파일은 "start /wait" 로 marsRule2000.exe 를 자식으로 띄우므로 프로세스 트리 전체를 죽인다.
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    try:
+        process.communicate(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_process(command, timeout=None, shell=False):
+    if os.name == "nt":
+        kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        kwargs = {"start_new_session": True}
+    process = subprocess.Popen(
+        command, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, **kwargs
+    )
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        kill_process_tree(process)
+        raise SolverError("timeout", f"{timeout}초 안에 끝나지 않아 종료함: {command}")
+
+    if process.returncode != 0:
+        raise SolverError("exit", f"실행 실패 (code {process.returncode}): {stderr.strip()}")
+
+
+class SolverBackend:
+    timeout = None
+
+    def run(self, config):
+        raise NotImplementedError
+
+    def run_many(self, configs, batch_path):
+        return all([self.run(config) for config in configs])
+
+
+class BatchSolver(SolverBackend):
+    def run(self, config):
+        run_process(config["batch_path"], timeout=self.timeout, shell=True)
+        return True
+
+    def run_many(self, configs, batch_path):
+        # 후보 .ma2 들을 batch 파일 하나에 모아 한 번에 실행한다.
+        write_batch_file(batch_path, configs[0], [config["input_path"] for config in configs])
+
+        timeout = self.timeout * len(configs) if self.timeout else None
+        run_process(batch_path, timeout=timeout, shell=True)
+        return True
+
+
+class ExeSolver(SolverBackend):
+    # batch 파일과 "start /wait" 를 거치지 않고 실행 파일을 직접 띄운다. (PipelinedVecEnv 에서 사용)
+    def run(self, config):
+        run_process(mars_command(config), timeout=self.timeout)
+        return True
+
+
+def tbar_section(hweb, tweb, hflan, tflan, plate_breadth, plate_thick):
+    # 부착 판을 포함한 T-bar 단면의 단면계수(cm3)와 전단면적(cm2)
+    heights = [plate_thick, hweb, tflan]
+    areas = [plate_breadth * plate_thick, hweb * tweb, hflan * tflan]
+    centers = [plate_thick / 2, plate_thick + hweb / 2, plate_thick + hweb + tflan / 2]
+    own = [plate_breadth * plate_thick ** 3 / 12, tweb * hweb ** 3 / 12, hflan * tflan ** 3 / 12]
+
+    total_area = sum(areas)
+    neutral_axis = sum(a * c for a, c in zip(areas, centers)) / total_area
+    inertia = sum(i + a * (c - neutral_axis) ** 2 for i, a, c in zip(own, areas, centers))
+
+    depth = sum(heights)
+    modulus = inertia / np.maximum(depth - neutral_axis, neutral_axis) / 1000
+    shear_area = hweb * tweb / 100
+    return modulus, shear_area
+
+
+class LocalSolver(SolverBackend):
+    # MARS2000 이 없는 환경에서 파이프라인을 돌려보기 위한 대체 계산기.
+    # 같은 .ma2 를 읽고 같은 형식("Panel: N Stiffener: M")의 결과 파일을 쓴다.
+    items = [
+        "Gross W.",
+        "Net Load W.",
+        "Net Load Ash.",
+        "Net Test W.",
+        "Net Test Ash.",
+        "Net Mini Thick.",
+        "Net Mini Tflange.",
+    ]
+
+    def __init__(self, latency=0.0, seed=0, corrosion=1.0, plate_breadth=800.0, plate_thick=14.0):
+        self.latency = latency
+        self.seed = seed
+        self.corrosion = corrosion
+        self.plate_breadth = plate_breadth
+        self.plate_thick = plate_thick
+
+    def _requirements(self, panels, stiffeners):
+        # 하중은 설계와 무관하게 (panel, stiffener) 번호로만 정해지므로 같은 입력에는 항상 같은 결과가 나온다.
+        c = self.corrosion
+        ref_w, ref_ash = tbar_section(450.0, 12.5 - c, 150.0, 16.0 - c, self.plate_breadth, self.plate_thick - c)
+        load = np.empty(len(panels))
+        for i, (p, s) in enumerate(zip(panels, stiffeners)):
+            load[i] = np.random.default_rng((self.seed, int(p), int(s))).uniform(0.6, 1.3)
+        return load * ref_w, load * ref_ash
+
+    def evaluate(self, input_path):
+        with Ma2Index(input_path) as index:
+            df = group_stiff(index["stiff scant"], index["stiff loc"])
+
+        panels = df["Ipan"].to_numpy(dtype=np.int64)
+        stiffeners = df["stiff_index"].to_numpy(dtype=np.int64)
+        hweb, tweb, hflan, tflan = df.iloc[:, 4:8].to_numpy(dtype=np.float64).T
+
+        gross_w, _ = tbar_section(hweb, tweb, hflan, tflan, self.plate_breadth, self.plate_thick)
+        net_w, net_ash = tbar_section(
+            hweb, tweb - self.corrosion, hflan, tflan - self.corrosion,
+            self.plate_breadth, self.plate_thick - self.corrosion,
+        )
+        req_w, req_ash = self._requirements(panels, stiffeners)
+
+        values = np.stack([
+            np.stack([gross_w, req_w * 1.1]),
+            np.stack([net_w, req_w]),
+            np.stack([net_ash, req_ash]),
+            np.stack([net_w, req_w * 0.8]),
+            np.stack([net_ash, req_ash * 0.8]),
+            np.stack([tweb - self.corrosion, np.full_like(tweb, 9.5)]),
+            np.stack([tflan - self.corrosion, tweb - self.corrosion]),
+        ])
+        return panels, stiffeners, values
+
+    def write_result(self, input_path, output_path):
+        panels, stiffeners, values = self.evaluate(input_path)
+
+        lines = ["MARS2000 local stand-in results", ""]
+        for panel in np.unique(panels):
+            lines.append(f"Panel: {panel:4d} Strake: {1:4d}")
+            lines.append(f"{'Actual':>40s}{'Rule':>12s}")
+            lines.append(f"{'Gross Thick.:':<28s}{self.plate_thick:12.3f}{self.plate_thick - 2:12.3f}")
+
+            for row in np.flatnonzero(panels == panel):
+                lines.append(f"Panel: {panel:4d} Stiffener: {stiffeners[row]:4d}")
+                lines.append(f"{'Actual':>40s}{'Rule':>12s}")
+                for item, (actual, rule) in zip(self.items, values[:, :, row]):
+                    lines.append(f"{item + ':':<28s}{actual:12.3f}{rule:12.3f}")
+            lines.append("")
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+
+    def run(self, config):
+        start = time.perf_counter()
+        self.write_result(config["input_path"], config["output_path"])
+        remaining = self.latency - (time.perf_counter() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        return True
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class SolverWatchdog(SolverBackend):
+    # solver 실행을 감싸서 시간 제한, 결과 파일 신선도 확인, 재시도, 작업 폴더 격리를 맡는다.
+    # 같은 작업 폴더에서 quarantine_after 번 연속으로 (재시도까지) 실패하면 그 폴더를 격리한다.
+    def __init__(self, backend, timeout=600.0, retries=2, backoff=5.0, quarantine_after=3):
+        self.backend = backend
+        self.backend.timeout = timeout
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.quarantine_after = quarantine_after
+        self.consecutive_failures = 0
+        self.quarantined = False
+        self.metrics = {"runs": 0, "failures": 0, "timeouts": 0, "stale": 0, "retries": 0, "quarantined": 0}
+
+    def _attempt(self, config):
+        output = config["output_path"]
+        # 이전 스텝의 결과 파일은 수정 시각을 0 으로 돌려 두고, 실행 뒤에도 그대로면 갱신되지 않은 것으로 본다.
+        if _mtime_ns(output) is not None:
+            os.utime(output, ns=(0, 0))
+
+        self.metrics["runs"] += 1
+        self.backend.run(config)
+
+        mtime = _mtime_ns(output)
+        if mtime is None:
+            raise SolverError("missing", f"결과 파일 없음: {output}")
+        if mtime == 0:
+            self.metrics["stale"] += 1
+            raise SolverError("stale", f"결과 파일이 갱신되지 않음: {output}")
+
+    def run(self, config):
+        if self.quarantined:
+            raise SolverError("quarantined", f"격리된 작업 폴더: {config.get('mars_path')}")
+
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.metrics["retries"] += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                self._attempt(config)
+            except SolverError as e:
+                self.metrics["failures"] += 1
+                if e.kind == "timeout":
+                    self.metrics["timeouts"] += 1
+                print(f"[MARS ERROR] {e} (시도 {attempt + 1}/{self.retries + 1})")
+                error = e
+                continue
+
+            self.consecutive_failures = 0
+            return True
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.quarantine_after:
+            self._quarantine(config, error)
+        raise error
+
+    def run_many(self, configs, batch_path):
+        if self.quarantined:
+            print(f"[MARS ERROR] 격리된 작업 폴더: {configs[0].get('mars_path')}")
+            return False
+        self.metrics["runs"] += 1
+        try:
+            return self.backend.run_many(configs, batch_path)
+        except SolverError as e:
+            self.metrics["failures"] += 1
+            if e.kind == "timeout":
+                self.metrics["timeouts"] += 1
+            print(f"[MARS ERROR] {e}")
+            return False
+
+    def _quarantine(self, config, error):
+        self.quarantined = True
+        self.metrics["quarantined"] += 1
+        workspace = config.get("mars_path", os.path.dirname(config["input_path"]))
+        print(f"[MARS ERROR] 작업 폴더 격리: {workspace}")
+        try:
+            with open(os.path.join(workspace, "QUARANTINED"), "w", encoding="utf-8") as f:
+                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {error.kind}: {error}\n")
+        except OSError:
+            pass
+
+
+SOLVERS = {
+    "mars": BatchSolver,
+    "mars_exe": ExeSolver,
+    "local": LocalSolver,
+}
+
+
+def get_solver(config, direct=False):
+    name = config.get("solver", "mars")
+    if name == "mars" and direct:
+        name = "mars_exe"
+    if name not in SOLVERS:
+        raise ValueError(f"unknown solver backend: {name}")
+
+    if name == "local":
+        backend = LocalSolver(
+            latency=config.get("solver_latency", 0.0),
+            seed=config.get("solver_seed", 0),
+        )
+    else:
+        backend = SOLVERS[name]()
+
+    watchdog = config.get("watchdog") or {}
+    return SolverWatchdog(
+        backend,
+        timeout=watchdog.get("timeout", 600.0),
+        retries=watchdog.get("retries", 2),
+        backoff=watchdog.get("backoff", 5.0),
+        quarantine_after=watchdog.get("quarantine_after", 3),
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    LocalSolver().write_result(sys.argv[1], sys.argv[2])
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+STEP_PHASES = ("write", "cache", "solver", "parse", "evaluate", "prescreen", "surrogate", "observation")
+PERCENTILES = (50, 90, 99)
+
+
+class PhaseTimer:
+    def __init__(self, trace_path=None, max_events=200000):
+        self.trace_path = trace_path
+        self.max_events = max_events
+        self.step_times = defaultdict(float)
+        self.episode_times = defaultdict(list)
+        self.events = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.step_times[name] += end - start
+            if self.trace_path and len(self.events) < self.max_events:
+                self.events.append({
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self._origin) * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": self._pid,
+                    "tid": 0,
+                })
+
+    def add(self, name, seconds):
+        self.step_times[name] += seconds
+
+    def end_step(self):
+        times = {name: self.step_times.get(name, 0.0) for name in STEP_PHASES}
+        for name, value in times.items():
+            self.episode_times[name].append(value)
+        self.step_times = defaultdict(float)
+        return times
+
+    def discard_step(self):
+        self.step_times = defaultdict(float)
+
+    def end_episode(self):
+        summary = {}
+        for name in STEP_PHASES:
+            values = self.episode_times.get(name) or [0.0]
+            for q in PERCENTILES:
+                summary[f"t_{name}_p{q}"] = float(np.percentile(values, q))
+        self.episode_times = defaultdict(list)
+
+        if self.trace_path:
+            self.dump_trace()
+        return summary
+
+    def dump_trace(self, path=None):
+        # chrome://tracing 또는 Perfetto 에서 열 수 있는 형식
+        path = path or self.trace_path
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+def timed(timer, name):
+    if timer is None:
+        return nullcontext()
+    return timer.phase(name)
+
+
+def episode_info_keywords():
+    return tuple(f"t_{name}_p{q}" for name in STEP_PHASES for q in PERCENTILES)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+STEEL_DENSITY = 7.85  # t/m3
+
+
+def profile_area(specs):
+    # specs: (n, 4) [hweb, tweb, hflan, tflan] (mm) -> 단면적 (mm2). 플랜지가 없는 형식은 nan 을 0 으로 본다.
+    hweb, tweb, hflan, tflan = np.nan_to_num(np.atleast_2d(np.asarray(specs, dtype=np.float64))).T
+    return hweb * tweb + hflan * tflan
+
+
+def stiffener_spans(df_stiff, default_span=1.0):
+    # STIFF SCANT 에 Span 열(m)이 있으면 쓰고, 없으면 설정값을 모든 stiffener 에 쓴다.
+    if "Span" in df_stiff.columns:
+        spans = pd.to_numeric(df_stiff["Span"], errors="coerce").to_numpy(dtype=np.float64)
+        return np.where(np.isfinite(spans) & (spans > 0), spans, default_span)
+    return np.full(len(df_stiff), float(default_span))
+
+
+class WeightTracker:
+    # stiffener 별 무게(kg)를 배열로 들고 있다가 그룹 치수가 바뀌면 그 행만 다시 계산한다.
+    def __init__(self, specs, spans, groups, panels, density=STEEL_DENSITY):
+        # mm2 * m * t/m3 -> kg
+        self.factor = np.asarray(spans, dtype=np.float64) * density * 1e-3
+        self.groups = np.asarray(groups, dtype=np.int64)
+        self.panel_ids, self.panel_inverse = np.unique(np.asarray(panels, dtype=np.int64), return_inverse=True)
+
+        self._baseline = profile_area(specs) * self.factor
+        self.reset()
+
+    def reset(self):
+        self.row_weight = self._baseline.copy()
+        self.group_weight = np.bincount(self.groups, weights=self.row_weight)
+        self.total = float(self.row_weight.sum())
+
+    def update(self, rows, specs):
+        rows = np.asarray(rows, dtype=np.int64)
+        new = profile_area(specs) * self.factor[rows]
+        delta = new - self.row_weight[rows]
+        self.row_weight[rows] = new
+        np.add.at(self.group_weight, self.groups[rows], delta)
+        self.total += float(delta.sum())
+        return self.total
+
+    def weight_of(self, specs):
+        return float((profile_area(specs) * self.factor).sum())
+
+    def by_panel(self):
+        weights = np.bincount(self.panel_inverse, weights=self.row_weight, minlength=len(self.panel_ids))
+        return pd.Series(weights, index=pd.Index(self.panel_ids, name="panel"), name="weight")
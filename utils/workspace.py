@@ -0,0 +1,74 @@
+import os
+import shutil
+
+BATCH_TEMPLATE = (
+    "set testpath={testpath}\n"
+    "set inputfile={inputfile}\n"
+    "\n"
+    "start /wait %testpath%\\marsRule2000.exe /marsodt \"%inputfile%\" 1"
+)
+
+
+def to_windows_path(path):
+    return path.replace("/", "\\")
+
+
+def mars_home(config):
+    return config.get("mars_home", os.path.dirname(config["mars_path"].rstrip("/\\")))
+
+
+def result_name(config, input_path):
+    # MARS 결과 파일 이름은 입력 파일 이름 뒤에 "_ 1_S_BV RULES.txt" 가 붙는 형태
+    base_stem = os.path.splitext(os.path.basename(config["input_path"]))[0]
+    base_output = os.path.basename(config["output_path"])
+    suffix = base_output[len(base_stem):] if base_output.startswith(base_stem) else "_ 1_S_BV RULES.txt"
+    return os.path.splitext(os.path.basename(input_path))[0] + suffix
+
+
+def write_batch_file(batch_path, config, input_paths):
+    if isinstance(input_paths, str):
+        input_paths = [input_paths]
+
+    lines = []
+    for input_path in input_paths:
+        lines.append(BATCH_TEMPLATE.format(
+            testpath=to_windows_path(mars_home(config)),
+            inputfile=to_windows_path(input_path),
+        ))
+
+    with open(batch_path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(lines))
+
+
+def make_worker_config(config, rank):
+    root = config.get("workspace_root", os.path.join(config["mars_path"], "Workers"))
+    worker_dir = os.path.join(root, f"w{rank}")
+
+    # TestCases 와 같은 InputData / Output / Batch 구조를 작업자마다 만든다.
+    input_dir = os.path.join(worker_dir, "InputData")
+    output_dir = os.path.join(worker_dir, "Output")
+    batch_dir = os.path.join(worker_dir, "Batch")
+    for d in (input_dir, output_dir, batch_dir):
+        os.makedirs(d, exist_ok=True)
+
+    base_stem = os.path.splitext(os.path.basename(config["input_path"]))[0]
+    input_path = os.path.join(input_dir, f"{base_stem}_w{rank}.ma2")
+    temp_path = os.path.join(input_dir, "temp.ma2")
+    batch_path = os.path.join(batch_dir, "run.bat")
+
+    shutil.copy(config["temp_path"], temp_path)
+    if not os.path.exists(input_path):
+        shutil.copy(temp_path, input_path)
+    write_batch_file(batch_path, config, input_path)
+
+    worker = dict(config)
+    worker.update({
+        "rank": rank,
+        "mars_home": mars_home(config),
+        "mars_path": worker_dir,
+        "batch_path": batch_path,
+        "input_path": input_path,
+        "output_path": os.path.join(output_dir, result_name(config, input_path)),
+        "temp_path": temp_path,
+    })
+    return worker